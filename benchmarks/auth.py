@@ -0,0 +1,67 @@
+# Measures what checking the bearer token costs each authenticated request,
+# for each signing algorithm, with and without the verified-token cache:
+#
+#   uncached - get_subject_for_token_type verifying the signature every time
+#              (what every request paid before the cache)
+#   cached   - the same client sending the same token again
+#
+#   python benchmarks/auth.py --requests 20000
+#
+# Runs in a single thread, so the rate is per core.
+import argparse
+import os
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+
+def private_key_pem(algorithm: str) -> str:
+    if algorithm.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def measure(requests: int, check, clear) -> float:
+    # Microseconds per request
+    start = time.perf_counter()
+    for _ in range(requests):
+        clear()
+        check()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    # Settings are read on import
+    os.environ["ENV_STATE"] = "test"
+    os.environ.setdefault("TEST_SECRET_KEY", "benchmark")
+    os.environ.setdefault("TEST_ALGORITHM", "HS256")
+    from storeapi import security
+    from storeapi.keys import load_key_set
+
+    for algorithm in ("HS256", "RS256", "ES256"):
+        private_key = None if algorithm == "HS256" else private_key_pem(algorithm)
+        security.ALGORITHM = algorithm
+        security.key_set = load_key_set(algorithm, "benchmark", private_key)
+        token = security.create_access_token("user@example.net")
+
+        def check():
+            security.get_subject_for_token_type(token, "access")
+
+        uncached = measure(args.requests, check, security.token_cache.clear)
+        cached = measure(args.requests, check, lambda: None)
+        print(f"{algorithm}: uncached {uncached:7.1f} us/request, cached {cached:5.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
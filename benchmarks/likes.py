@@ -0,0 +1,82 @@
+# Compares sustained likes/s with one transaction per like against the
+# LikeBuffer, at the same concurrency: many users liking a few hot posts.
+#
+#   TEST_SECRET_KEY=x TEST_ALGORITHM=HS256 python benchmarks/likes.py --likes 2000
+#
+# Runs against a throwaway SQLite database; pass --url with an empty
+# PostgreSQL database to measure there instead. SQLite allows one writer, so
+# concurrent unbuffered likes can fail with "database is locked"; those are
+# counted and left out of the rate.
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+async def run(args, buffered: bool) -> tuple[float, int]:
+    from storeapi import likes
+    from storeapi.config import config
+    from storeapi.database import database, post_table, user_table
+    from storeapi.migrations import upgrade_database
+
+    await upgrade_database(config.DATABASE_URL)
+    config.LIKE_BUFFER_ENABLED = buffered
+    async with database:
+        await database.execute("DELETE FROM likes")
+        await database.execute("DELETE FROM posts")
+        await database.execute("DELETE FROM users")
+        await database.execute_many(
+            user_table.insert(),
+            [
+                {"id": i, "email": f"user{i}@example.net", "username": f"user{i}", "password": "x"}
+                for i in range(1, args.likes + 1)
+            ],
+        )
+        await database.execute_many(
+            post_table.insert(),
+            [{"id": i, "body": f"post {i}", "user_id": 1} for i in range(1, args.posts + 1)],
+        )
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        failed = 0
+
+        async def like(user_id: int) -> None:
+            nonlocal failed
+            async with semaphore:
+                try:
+                    result = await likes.like(user_id % args.posts + 1, user_id)
+                except Exception:
+                    failed += 1
+                    return
+                assert result and result.created
+
+        start = time.perf_counter()
+        await asyncio.gather(*(like(user_id) for user_id in range(1, args.likes + 1)))
+        elapsed = time.perf_counter() - start
+        await likes.like_buffer.close()
+    return (args.likes - failed) / elapsed, failed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="empty database to benchmark against")
+    parser.add_argument("--likes", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Settings are read on import, so point them at the benchmark database first
+        os.environ["ENV_STATE"] = "test"
+        os.environ["TEST_DATABASE_URL"] = args.url or f"sqlite:///{tmp}/likes.db"
+        os.environ["TEST_DB_FORCE_ROLL_BACK"] = "false"
+        direct = asyncio.run(run(args, buffered=False))
+        buffered = asyncio.run(run(args, buffered=True))
+
+    for name, (rate, failed) in (("direct", direct), ("buffered", buffered)):
+        print(f"{name:>8}: {rate:8.0f} likes/s, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Compares query plans and timings of the hot post/comment/like queries on a
+# schema without secondary indexes against the schema declared in
+# storeapi/database.py.
+#
+#   ENV_STATE=test python benchmarks/query_plans.py --posts 20000
+#
+# By default it builds throwaway SQLite databases; pass --url with an empty
+# PostgreSQL database to get EXPLAIN ANALYZE output from Postgres instead.
+import argparse
+import random
+import tempfile
+import time
+
+import sqlalchemy
+
+from storeapi.database import comment_table, like_table, metadata, post_table, user_table
+
+
+def schema_without_indexes() -> sqlalchemy.MetaData:
+    bare = sqlalchemy.MetaData()
+    for table in metadata.sorted_tables:
+        copy = table.to_metadata(bare)
+        copy.indexes.clear()
+        for constraint in list(copy.constraints):
+            if isinstance(constraint, sqlalchemy.UniqueConstraint) and constraint.name:
+                copy.constraints.remove(constraint)
+    return bare
+
+
+def populate(engine: sqlalchemy.Engine, posts: int, users: int) -> None:
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(
+            user_table.insert(),
+            [
+                {"id": i, "email": f"user{i}@example.net", "username": f"user{i}", "password": "x"}
+                for i in range(1, users + 1)
+            ],
+        )
+        conn.execute(
+            post_table.insert(),
+            [
+                {"id": i, "body": f"post {i}", "user_id": rng.randint(1, users), "like_count": 0}
+                for i in range(1, posts + 1)
+            ],
+        )
+        likes = {
+            (rng.randint(1, posts), rng.randint(1, users)) for _ in range(posts * 3)
+        }
+        conn.execute(
+            like_table.insert(),
+            [{"post_id": post_id, "user_id": user_id} for post_id, user_id in likes],
+        )
+        conn.execute(
+            comment_table.insert(),
+            [
+                {"body": "comment", "post_id": rng.randint(1, posts), "user_id": rng.randint(1, users)}
+                for _ in range(posts * 2)
+            ],
+        )
+
+
+def hot_queries(post_id: int, user_id: int) -> dict[str, sqlalchemy.Executable]:
+    feed = sqlalchemy.select(post_table).limit(21)
+    return {
+        "feed most_likes": feed.order_by(post_table.c.like_count.desc(), post_table.c.id.desc()),
+        "user posts": feed.where(post_table.c.user_id == user_id).order_by(post_table.c.id.desc()),
+        "post comments": sqlalchemy.select(comment_table)
+        .where(comment_table.c.post_id == post_id)
+        .order_by(comment_table.c.id),
+        "like exists": sqlalchemy.select(like_table).where(
+            like_table.c.post_id == post_id, like_table.c.user_id == user_id
+        ),
+        "like recount": sqlalchemy.select(sqlalchemy.func.count(like_table.c.id)).where(
+            like_table.c.post_id == post_id
+        ),
+        "delete likes": like_table.delete().where(like_table.c.post_id == post_id),
+        "delete comments": comment_table.delete().where(comment_table.c.post_id == post_id),
+    }
+
+
+def explain(conn: sqlalchemy.Connection, query: sqlalchemy.Executable) -> list[str]:
+    compiled = query.compile(conn, compile_kwargs={"literal_binds": True})
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(sqlalchemy.text(f"EXPLAIN QUERY PLAN {compiled}"))
+        return [row.detail for row in rows]
+    rows = conn.execute(sqlalchemy.text(f"EXPLAIN ANALYZE {compiled}"))
+    return [row[0] for row in rows]
+
+
+def measure(engine: sqlalchemy.Engine, queries: dict, repeat: int) -> dict[str, tuple]:
+    results = {}
+    for name, query in queries.items():
+        with engine.connect() as conn:
+            plan = explain(conn, query)
+            # EXPLAIN ANALYZE runs deletes for real, so throw its work away
+            conn.rollback()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                with conn.begin() as transaction:
+                    conn.execute(query)
+                    transaction.rollback()
+            elapsed = (time.perf_counter() - start) / repeat
+        results[name] = (plan, elapsed)
+    return results
+
+
+def run(url: str, schema: sqlalchemy.MetaData, args) -> dict[str, tuple]:
+    engine = sqlalchemy.create_engine(url)
+    schema.drop_all(engine)
+    schema.create_all(engine)
+    populate(engine, args.posts, args.users)
+    results = measure(engine, hot_queries(args.posts // 2, args.users // 2), args.repeat)
+    schema.drop_all(engine)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="empty database to benchmark against")
+    parser.add_argument("--posts", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = run(args.url or f"sqlite:///{tmp}/before.db", schema_without_indexes(), args)
+        after = run(args.url or f"sqlite:///{tmp}/after.db", metadata, args)
+
+    for name in before:
+        (before_plan, before_time), (after_plan, after_time) = before[name], after[name]
+        print(f"== {name}: {before_time * 1000:.3f} ms -> {after_time * 1000:.3f} ms")
+        print("   before: " + "\n           ".join(before_plan))
+        print("   after:  " + "\n           ".join(after_plan))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Compares GET /search's indexed query with the scan clients could do
+# without it (a LIKE over every post and comment body), on a synthetic corpus
+# whose word frequencies follow a Zipf distribution.
+#
+#   ENV_STATE=test python benchmarks/search.py --posts 20000
+#
+# Runs against a throwaway SQLite database (FTS5); pass --url with an empty
+# PostgreSQL database to measure the tsvector/GIN index instead. The scan
+# stops at the first page of matches and doesn't rank them, so for common
+# words it can beat the index, which scores every match.
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+import databases
+import sqlalchemy
+
+from storeapi.database import comment_table, post_table, user_table
+from storeapi.migrations import upgrade
+from storeapi.routers.search import search_documents
+
+VOCABULARY = 20_000
+WORDS_PER_POST = 30
+WORDS_PER_COMMENT = 12
+
+
+def make_text(rng: random.Random, weights: list[float], words: int) -> str:
+    return " ".join(f"w{i}" for i in rng.choices(range(VOCABULARY), weights, k=words))
+
+
+async def populate(db: databases.Database, posts: int) -> None:
+    rng = random.Random(42)
+    weights = [1 / rank for rank in range(1, VOCABULARY + 1)]
+    await db.execute(
+        user_table.insert().values(id=1, email="a@example.net", username="a", password="x")
+    )
+    await db.execute_many(
+        post_table.insert(),
+        [
+            {"id": i, "body": make_text(rng, weights, WORDS_PER_POST), "user_id": 1}
+            for i in range(1, posts + 1)
+        ],
+    )
+    await db.execute_many(
+        comment_table.insert(),
+        [
+            {
+                "body": make_text(rng, weights, WORDS_PER_COMMENT),
+                "post_id": rng.randint(1, posts),
+                "user_id": 1,
+            }
+            for _ in range(posts * 2)
+        ],
+    )
+
+
+async def scan(db: databases.Database, q: str, limit: int) -> list:
+    # Whole words only, like the index: bodies are padded with spaces
+    def contains_word(body):
+        return (sqlalchemy.literal(" ") + body + " ").like(f"% {q} %")
+
+    query = sqlalchemy.union_all(
+        sqlalchemy.select(post_table.c.id).where(contains_word(post_table.c.body)),
+        sqlalchemy.select(comment_table.c.id).where(contains_word(comment_table.c.body)),
+    ).limit(limit)
+    return await db.fetch_all(query)
+
+
+async def measure(search, db: databases.Database, terms: list[str], seconds: float) -> float:
+    queries = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        await search(db, terms[queries % len(terms)], 20)
+        queries += 1
+    return queries / seconds
+
+
+async def run(url: str, args) -> None:
+    async with databases.Database(url) as db:
+        await upgrade(db)
+        start = time.perf_counter()
+        async with db.transaction():
+            await populate(db, args.posts)
+        print(f"indexed {args.posts} posts and {args.posts * 2} comments "
+              f"in {time.perf_counter() - start:.1f}s")
+        # Rare words (the tail of the distribution) and common ones
+        for label, terms in (
+            ("rare", [f"w{i}" for i in range(5_000, 5_050)]),
+            ("common", [f"w{i}" for i in range(1, 50)]),
+        ):
+            indexed = await measure(search_documents, db, terms, args.seconds)
+            scanned = await measure(scan, db, terms, args.seconds)
+            print(f"{label:>7}: index {indexed:8.0f} queries/s, "
+                  f"scan {scanned:8.0f} queries/s ({indexed / scanned:.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="empty database to benchmark against")
+    parser.add_argument("--posts", type=int, default=20_000)
+    parser.add_argument("--seconds", type=float, default=2.0, help="per query kind")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run(args.url, args))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(f"sqlite:///{tmp}/search.db", args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Compares the cost of turning a page of feed rows into a JSON body:
+#
+#   default    - what FastAPI does with response_model: validate every row,
+#                dump it to JSON-able Python and encode it with json.dumps
+#   validated  - pydantic validates and encodes in one pass (dump_json)
+#   fast       - storeapi.serialization: rows encoded directly with orjson
+#
+#   ENV_STATE=test python benchmarks/serialization.py --rows 100
+#
+# Runs in a single thread, so pages/s is throughput per core.
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+import databases
+import sqlalchemy
+
+from storeapi.database import metadata, post_table, user_table
+from storeapi.models.post import UserPostWithLikes
+from storeapi.routers.post import select_post_and_likes
+from storeapi.serialization import dump_rows_fast, dump_rows_validated, list_adapter
+
+
+def dump_rows_default(rows, model) -> bytes:
+    adapter = list_adapter(model)
+    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+async def fetch_rows(url: str, count: int) -> list:
+    engine = sqlalchemy.create_engine(url)
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(user_table.insert(), [{"id": 1, "email": "a@example.net", "username": "a", "password": "x"}])
+        conn.execute(
+            post_table.insert(),
+            [
+                {
+                    "body": f"post body number {i} " * 4,
+                    "user_id": 1,
+                    "image_url": f"https://example.net/{i}.png",
+                    "image_variants": {"thumbnail": f"https://example.net/{i}.thumbnail.jpg"},
+                    "like_count": i,
+                }
+                for i in range(count)
+            ],
+        )
+    engine.dispose()
+    async with databases.Database(url) as database:
+        return await database.fetch_all(select_post_and_likes)
+
+
+def measure(dump, rows, seconds: float) -> float:
+    pages = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        dump(rows, UserPostWithLikes)
+        pages += 1
+    return pages / seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100, help="rows per page")
+    parser.add_argument("--seconds", type=float, default=2.0, help="per serializer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = asyncio.run(fetch_rows(f"sqlite:///{tmp}/bench.db", args.rows))
+
+    baseline = None
+    for name, dump in (
+        ("default", dump_rows_default),
+        ("validated", dump_rows_validated),
+        ("fast", dump_rows_fast),
+    ):
+        rate = measure(dump, rows, args.seconds)
+        baseline = baseline or rate
+        print(
+            f"{name:>10}: {rate:10.0f} pages/s {rate * args.rows:12.0f} rows/s "
+            f"({rate / baseline:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from storeapi import metrics
+from storeapi.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    # Bounded LRU mapping whose entries also expire after their ttl
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self, prefix: str = "") -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Any | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def clear(self, prefix: str) -> None: ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    # Per-worker cache; values are returned as stored, so callers must not
+    # mutate them.
+    def __init__(self, maxsize: int) -> None:
+        self._cache = TTLCache(maxsize)
+
+    async def get(self, key: str) -> Any | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def clear(self, prefix: str) -> None:
+        self._cache.clear(prefix)
+
+
+# Marks values stored as raw bytes; JSON text never starts with a NUL byte
+_RAW_BYTES = b"\x00"
+
+
+class RedisCacheBackend(CacheBackend):
+    # Shared between workers. Values must be bytes or JSON serializable.
+    def __init__(self, url: str) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(f"CACHE_URL={url} requires the redis package") from e
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Any | None:
+        value = await self._client.get(key)
+        if value is None:
+            return None
+        if value.startswith(_RAW_BYTES):
+            return value[len(_RAW_BYTES):]
+        return json.loads(value)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        if isinstance(value, bytes):
+            value = _RAW_BYTES + value
+        else:
+            value = json.dumps(value, default=str)
+        await self._client.set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+    async def clear(self, prefix: str) -> None:
+        keys = [key async for key in self._client.scan_iter(match=f"{prefix}*")]
+        if keys:
+            await self._client.delete(*keys)
+
+
+_shared_backends: dict[str, CacheBackend] = {}
+
+
+def create_cache_backend(url: Optional[str], maxsize: int) -> CacheBackend:
+    if not url or url == "memory://":
+        return MemoryCacheBackend(maxsize)
+    if url.startswith(("redis://", "rediss://")):
+        if url not in _shared_backends:
+            _shared_backends[url] = RedisCacheBackend(url)
+        return _shared_backends[url]
+    raise ValueError(f"unsupported cache url {url}")
+
+
+class Cache:
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        maxsize: int = 10_000,
+        backend: Optional[CacheBackend] = None,
+    ) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self.backend = backend or create_cache_backend(config.CACHE_URL, maxsize)
+        self.hits = metrics.counter(f"{namespace}_cache.hits")
+        self.misses = metrics.counter(f"{namespace}_cache.misses")
+        metrics.register_collector(f"{namespace}_cache", self.stats)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Any | None:
+        value = await self.backend.get(self._key(key))
+        if value is None:
+            self.misses.inc()
+        else:
+            self.hits.inc()
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.backend.set(self._key(key), value, self.ttl if ttl is None else ttl)
+
+    async def delete(self, key: str) -> None:
+        await self.backend.delete(self._key(key))
+
+    async def clear(self) -> None:
+        await self.backend.clear(self._key(""))
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits.value + self.misses.value
+        return {"hit_rate": self.hits.value / lookups if lookups else 0.0}
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    headers: dict[str, str]
+    # Seconds since the response was rendered
+    age: float
+
+
+class ResponseCache(Cache):
+    # Pre-serialized response bodies. Entries are keyed under a generation
+    # that invalidate() replaces, so invalidating is a single write however
+    # many pages are cached; old entries are left to expire.
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        maxsize: int = 10_000,
+        backend: Optional[CacheBackend] = None,
+    ) -> None:
+        super().__init__(namespace, ttl, maxsize, backend)
+        self.hit_age = metrics.counter(f"{namespace}_cache.hit_age_seconds")
+        self.invalidations = metrics.counter(f"{namespace}_cache.invalidations")
+
+    async def generation(self) -> str:
+        # Read before rendering a response and passed to set_response(): a
+        # response rendered while a write invalidated the cache is stored
+        # under the old generation and never served.
+        key = self._key("generation")
+        generation = await self.backend.get(key)
+        if generation is None:
+            # Evicted or never set; a fresh generation can't match old entries
+            generation = uuid.uuid4().hex
+            await self.backend.set(key, generation, self.ttl * 10)
+        return generation
+
+    async def get_response(self, generation: str, key: str) -> Optional[CachedResponse]:
+        value = await self.get(f"{generation}:{key}")
+        if value is None:
+            return None
+        meta, body = value.split(b"\n", 1)
+        meta = json.loads(meta)
+        age = max(time.time() - meta["stored_at"], 0.0)
+        self.hit_age.inc(age)
+        return CachedResponse(body, meta["headers"], age)
+
+    async def set_response(
+        self, generation: str, key: str, body: bytes, headers: dict[str, str]
+    ) -> None:
+        meta = json.dumps({"headers": headers, "stored_at": time.time()})
+        await self.set(f"{generation}:{key}", meta.encode() + b"\n" + body)
+
+    async def invalidate(self) -> None:
+        self.invalidations.inc()
+        await self.backend.set(self._key("generation"), uuid.uuid4().hex, self.ttl * 10)
+
+    def stats(self) -> dict[str, float]:
+        stats = super().stats()
+        hits = self.hits.value
+        stats["mean_hit_age_seconds"] = self.hit_age.value / hits if hits else 0.0
+        return stats
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal,Optional
 from functools import lru_cache
 from pydantic_settings import BaseSettings,SettingsConfigDict
 class BaseConfig(BaseSettings):
@@ -8,21 +8,105 @@ class BaseConfig(BaseSettings):
 class GlobalConfig(BaseConfig):
     DATABASE_URL:Optional[str]=None
     DB_FORCE_ROLL_BACK:bool=False
+    # Each worker's asyncpg pool (PostgreSQL only): keep workers × DB_POOL_MAX_SIZE
+    # below the server's max_connections
+    DB_POOL_MIN_SIZE:int=2
+    DB_POOL_MAX_SIZE:int=10
+    # How long a query waits for a free connection before the request gets a 503
+    DB_POOL_ACQUIRE_TIMEOUT_SECONDS:float=5
+    # Connections above DB_POOL_MIN_SIZE are closed after being idle this long
+    DB_POOL_MAX_IDLE_SECONDS:float=300
+    # Prepared statements cached per connection; set 0 behind PgBouncer in
+    # transaction mode
+    DB_STATEMENT_CACHE_SIZE:int=100
+    # Read replicas for GET /post, /post/{id}, /post/{id}/comment and
+    # /user/{id}/posts, as a JSON list. A user who wrote within
+    # READ_YOUR_WRITES_SECONDS reads from the primary; keep it above the
+    # replicas' usual lag.
+    DATABASE_REPLICA_URLS:list[str]=[]
+    READ_YOUR_WRITES_SECONDS:float=10
     LOGTAIL_KEY:Optional[str]=None
     SECRET_KEY:str
     ALGORITHM:str
+    # With RS256/ES256 (or RS384/RS512/ES384/ES512) tokens are signed with
+    # this PEM private key instead of SECRET_KEY, and the public half is
+    # served at /.well-known/jwks.json under JWT_KEY_ID (by default a hash of
+    # the key). After a rotation, list the previous public keys as a JSON
+    # object of key id to PEM so their tokens stay valid until they expire.
+    JWT_PRIVATE_KEY:Optional[str]=None
+    JWT_KEY_ID:Optional[str]=None
+    JWT_PUBLIC_KEYS:dict[str,str]={}
+    # Verified tokens are remembered for up to TOKEN_CACHE_TTL_SECONDS (never
+    # past their expiry); TOKEN_CACHE_MAX_SIZE=0 turns the cache off
+    TOKEN_CACHE_MAX_SIZE:int=10_000
+    TOKEN_CACHE_TTL_SECONDS:float=300
     B2_KEY_ID:Optional[str]=None
     B2_APPLICATION_KEY:Optional[str]=None
     B2_BUCKET_NAME:Optional[str]=None
+    # "local" writes uploads under LOCAL_STORAGE_DIR and "memory" keeps them
+    # in the worker's memory, instead of Backblaze B2
+    STORAGE_BACKEND:Literal["b2","local","memory"]="b2"
+    # B2 authorization tokens last 24 hours; renew well before that
+    B2_AUTH_REFRESH_SECONDS:int=12*60*60
+    LOCAL_STORAGE_DIR:str="uploads"
+    # B2 needs parts of at least 5 MB; each upload buffers two of them
+    UPLOAD_PART_SIZE:int=8*1024*1024
+    UPLOAD_WORKERS:int=8
+    # Resized variants are rendered in a process pool for image uploads up
+    # to IMAGE_MAX_BYTES
+    IMAGE_WORKERS:int=2
+    IMAGE_MAX_BYTES:int=20*1024*1024
+    # memory:// (default, per worker) or redis://host:port/db to share between workers
+    CACHE_URL:Optional[str]=None
+    USER_CACHE_TTL_SECONDS:int=60
+    USER_CACHE_MAX_SIZE:int=10_000
+    # Rendered GET /post pages. Writes invalidate the cache they go through,
+    # so with the per-worker memory cache other workers can serve a page up
+    # to FEED_CACHE_TTL_SECONDS old
+    FEED_CACHE_TTL_SECONDS:float=5
+    FEED_CACHE_MAX_SIZE:int=1000
+    # List endpoints encode rows straight to JSON with orjson; turn off to
+    # validate every row against the response model first
+    FAST_JSON_RESPONSES:bool=True
+    # GET /events streams post, like and comment events. memory:// (default)
+    # only reaches clients of the worker that made the change; use
+    # redis://host:port/db to fan out across workers
+    EVENTS_URL:Optional[str]=None
+    EVENTS_MAX_SUBSCRIBERS:int=10_000
+    # Events buffered per client before a slow client is disconnected
+    EVENTS_QUEUE_SIZE:int=100
+    EVENTS_HEARTBEAT_SECONDS:float=15
+    # Write likes in batches: a like waits up to LIKE_BUFFER_INTERVAL_SECONDS
+    # (or until LIKE_BUFFER_MAX_SIZE are waiting) and is answered once its
+    # batch commits
+    LIKE_BUFFER_ENABLED:bool=False
+    LIKE_BUFFER_INTERVAL_SECONDS:float=0.05
+    LIKE_BUFFER_MAX_SIZE:int=500
+    # New posts are copied into each follower's home timeline, unless the
+    # author has more followers than this; their posts are read directly
+    # from posts when a timeline is fetched instead
+    TIMELINE_FANOUT_MAX_FOLLOWERS:int=10_000
+    # Recent posts copied into a timeline when its owner follows someone
+    TIMELINE_BACKFILL_POSTS:int=100
+    # How often posts that gained likes or comments get their hot score
+    # recomputed for GET /post?sorting=hot
+    HOT_RECOMPUTE_INTERVAL_SECONDS:float=5
+    # bcrypt runs in this many threads; further requests queue up to
+    # PASSWORD_HASH_MAX_PENDING before being turned away with a 503
+    PASSWORD_HASH_WORKERS:int=4
+    PASSWORD_HASH_MAX_PENDING:int=64
 
 
 class DevConfig(GlobalConfig):
+    # Works without B2 credentials; set DEV_STORAGE_BACKEND=b2 to use B2
+    STORAGE_BACKEND:Literal["b2","local","memory"]="local"
     model_config=SettingsConfigDict(env_prefix="DEV_",extra="ignore")
 class ProdConfig(GlobalConfig):
     model_config=SettingsConfigDict(env_prefix="PROD_",extra="ignore")
 class TestConfig(GlobalConfig):
     DATABASE_URL:str="sqlite:///test.db"
     DB_FORCE_ROLL_BACK:bool=True
+    STORAGE_BACKEND:Literal["b2","local","memory"]="memory"
     model_config=SettingsConfigDict(env_prefix="TEST_",extra="ignore")
 
 @lru_cache()
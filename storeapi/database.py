@@ -1,3 +1,5 @@
+import sqlite3
+
 import databases
 import sqlalchemy
 from storeapi.config import config
@@ -13,6 +15,21 @@ user_table = sqlalchemy.Table(
     sqlalchemy.Column("password", sqlalchemy.String),
     sqlalchemy.Column("confirmed", sqlalchemy.Boolean, default=False),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
+    # Denormalized count of rows in follows, maintained by follow/unfollow
+    sqlalchemy.Column(
+        "follower_count",
+        sqlalchemy.Integer,
+        nullable=False,
+        server_default=sqlalchemy.text("0"),
+    ),
+    # Set once any of the user's posts was left out of their followers'
+    # timelines; those timelines read such posts from posts
+    sqlalchemy.Column(
+        "has_unfanned_posts",
+        sqlalchemy.Boolean,
+        nullable=False,
+        server_default=sqlalchemy.false(),
+    ),
 )
 
 post_table = sqlalchemy.Table(
@@ -22,7 +39,43 @@ post_table = sqlalchemy.Table(
     sqlalchemy.Column("body", sqlalchemy.String),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
     sqlalchemy.Column("image_url", sqlalchemy.String),
+    # Resized copies of image_url by variant name, as returned by /upload
+    sqlalchemy.Column("image_variants", sqlalchemy.JSON(none_as_null=True)),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
+    # Denormalized count of rows in likes, maintained by the like/delete endpoints
+    sqlalchemy.Column(
+        "like_count",
+        sqlalchemy.Integer,
+        nullable=False,
+        server_default=sqlalchemy.text("0"),
+    ),
+    # Bumped by every write that changes what GET /post/{id} returns (edits,
+    # likes, comments); ETags are built from it
+    sqlalchemy.Column(
+        "version",
+        sqlalchemy.Integer,
+        nullable=False,
+        server_default=sqlalchemy.text("1"),
+    ),
+    # Time-decayed engagement for the hot feed, see storeapi/hot.py
+    sqlalchemy.Column(
+        "hot_score",
+        sqlalchemy.Float,
+        nullable=False,
+        server_default=sqlalchemy.text("0"),
+    ),
+    # False when the author had too many followers to copy the post into
+    # their timelines (see storeapi/timeline.py)
+    sqlalchemy.Column(
+        "fanned_out",
+        sqlalchemy.Boolean,
+        nullable=False,
+        server_default=sqlalchemy.true(),
+    ),
+    sqlalchemy.Index("ix_posts_like_count_id", "like_count", "id"),
+    sqlalchemy.Index("ix_posts_hot_score_id", "hot_score", "id"),
+    # Serves a user's posts page (user_id filter, ordered by id)
+    sqlalchemy.Index("ix_posts_user_id_id", "user_id", "id"),
 )
 
 comment_table = sqlalchemy.Table(
@@ -30,25 +83,91 @@ comment_table = sqlalchemy.Table(
     metadata,
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
     sqlalchemy.Column("body", sqlalchemy.String),
-    sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), nullable=False),
+    # Deleted along with their post (a trigger on SQLite, see migration 0006)
+    sqlalchemy.Column(
+        "post_id", sqlalchemy.ForeignKey("posts.id", ondelete="CASCADE"), nullable=False
+    ),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
+    # Comments of a post in id order, and the comment delete in delete_post
+    sqlalchemy.Index("ix_comments_post_id_id", "post_id", "id"),
+    sqlalchemy.Index("ix_comments_user_id", "user_id"),
 )
 
 like_table = sqlalchemy.Table(
     "likes",
     metadata,
     sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
-    sqlalchemy.Column("post_id", sqlalchemy.ForeignKey("posts.id"), nullable=False),
+    sqlalchemy.Column(
+        "post_id", sqlalchemy.ForeignKey("posts.id", ondelete="CASCADE"), nullable=False
+    ),
     sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), nullable=False),
+    # A user can like a post once; the constraint's index also serves
+    # lookups and deletes by post_id
+    sqlalchemy.Index("uq_likes_post_id_user_id", "post_id", "user_id", unique=True),
+    sqlalchemy.Index("ix_likes_user_id", "user_id"),
+)
+
+class PoolTimeout(Exception):
+    # No pooled connection became free within DB_POOL_ACQUIRE_TIMEOUT_SECONDS
+    pass
+
+class Database(databases.Database):
+    # asyncpg URLs get the pool from storeapi.pool, which adds an acquire
+    # timeout and db_pool.* metrics
+    SUPPORTED_BACKENDS = {
+        **databases.Database.SUPPORTED_BACKENDS,
+        "postgresql": "storeapi.pool:InstrumentedPostgresBackend",
+        "postgres": "storeapi.pool:InstrumentedPostgresBackend",
+    }
+
+def pool_options(url: str, name: str = "primary") -> dict:
+    # `name` tells this pool's metrics apart from the other pools'
+    url = databases.DatabaseURL(url)
+    if url.dialect != "postgresql" or url.driver not in ("", "asyncpg"):
+        return {}
+    return {
+        "min_size": config.DB_POOL_MIN_SIZE,
+        "max_size": config.DB_POOL_MAX_SIZE,
+        "acquire_timeout": config.DB_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        "max_inactive_connection_lifetime": config.DB_POOL_MAX_IDLE_SECONDS,
+        "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+        "pool_name": name,
+    }
+
+follow_table = sqlalchemy.Table(
+    "follows",
+    metadata,
+    sqlalchemy.Column("follower_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("followee_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
+    sqlalchemy.Index("ix_follows_followee_id", "followee_id", "follower_id"),
+)
+
+# Each user's home timeline: their own posts and those of the accounts they
+# follow, written when the post is created. Posts of accounts with many
+# followers aren't copied here; timeline reads fetch those directly (see
+# storeapi/timeline.py).
+timeline_table = sqlalchemy.Table(
+    "timeline",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    # Deleted along with their post (a trigger on SQLite, see migration 0007)
+    sqlalchemy.Column(
+        "post_id", sqlalchemy.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True
+    ),
 )
 
-engine = sqlalchemy.create_engine(
-     config.DATABASE_URL,
-    pool_pre_ping=True
+# The schema is owned by storeapi/migrations; metadata here only describes it
+# for building queries. Apply migrations with `python -m storeapi.migrations upgrade`.
+database = Database(
+    config.DATABASE_URL,
+    force_rollback=config.DB_FORCE_ROLL_BACK,
+    **pool_options(config.DATABASE_URL),
 )
 
-metadata.create_all(engine)
-database = databases.Database(
-    config.DATABASE_URL, force_rollback=config.DB_FORCE_ROLL_BACK
-)
\ No newline at end of file
+def supports_returning() -> bool:
+    # INSERT/UPDATE/DELETE ... RETURNING; SQLite has it from 3.35
+    if database.url.dialect == "sqlite":
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return True
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional
+
+import orjson
+
+from storeapi import metrics
+from storeapi.config import config
+from storeapi.serialization import ORJSON_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[bytes], None]
+
+
+def format_event(event_type: str, data: dict[str, Any]) -> bytes:
+    # A complete server-sent event, encoded once and written as-is to
+    # every subscriber
+    return b"event: %s\ndata: %s\n\n" % (
+        event_type.encode(),
+        orjson.dumps(data, option=ORJSON_OPTIONS),
+    )
+
+
+class Subscriber:
+    def __init__(self, queue_size: int) -> None:
+        self.queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(queue_size)
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            # Wake the stream if it is waiting for an event
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class EventHub:
+    # Fans events out to this worker's open streams. Each subscriber has a
+    # bounded queue; one that falls behind is disconnected rather than
+    # buffering without limit, and its client reconnects.
+    def __init__(self, queue_size: int, max_subscribers: int) -> None:
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[Subscriber] = set()
+        self.subscribers = metrics.gauge("events.subscribers")
+        self.delivered = metrics.counter("events.delivered")
+        self.dropped = metrics.counter("events.dropped_subscribers")
+
+    @property
+    def full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.queue_size)
+        self._subscribers.add(subscriber)
+        self.subscribers.set(len(self._subscribers))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        self.subscribers.set(len(self._subscribers))
+
+    def broadcast(self, frame: bytes) -> None:
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self.dropped.inc()
+                subscriber.close()
+                self.unsubscribe(subscriber)
+        self.delivered.inc()
+
+    def close_all(self) -> None:
+        for subscriber in list(self._subscribers):
+            subscriber.close()
+            self.unsubscribe(subscriber)
+
+
+class PubSubBackend(ABC):
+    # Carries events from the worker that handled a write to every worker's hub
+    @abstractmethod
+    async def start(self, deliver: Deliver) -> None: ...
+
+    @abstractmethod
+    async def stop(self) -> None: ...
+
+    @abstractmethod
+    async def publish(self, frame: bytes) -> None: ...
+
+
+class LocalPubSub(PubSubBackend):
+    # Single worker: events go straight to this worker's hub
+    def __init__(self) -> None:
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+    async def publish(self, frame: bytes) -> None:
+        if self._deliver:
+            self._deliver(frame)
+
+
+class RedisPubSub(PubSubBackend):
+    channel = "storeapi:events"
+
+    def __init__(self, url: str) -> None:
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError(f"EVENTS_URL={url} requires the redis package") from e
+        self._client = redis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._listener = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver: Deliver) -> None:
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            deliver(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Events published while disconnected are lost; clients
+                # reconcile with a normal GET
+                logger.exception("events subscription failed, resubscribing")
+                await asyncio.sleep(1)
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        await self._client.aclose()
+
+    async def publish(self, frame: bytes) -> None:
+        await self._client.publish(self.channel, frame)
+
+
+def create_pubsub(url: Optional[str]) -> PubSubBackend:
+    if not url or url == "memory://":
+        return LocalPubSub()
+    if url.startswith(("redis://", "rediss://")):
+        return RedisPubSub(url)
+    raise ValueError(f"unsupported events url {url}")
+
+
+hub = EventHub(config.EVENTS_QUEUE_SIZE, config.EVENTS_MAX_SUBSCRIBERS)
+pubsub = create_pubsub(config.EVENTS_URL)
+published = metrics.counter("events.published")
+
+
+async def startup() -> None:
+    await pubsub.start(hub.broadcast)
+
+
+async def shutdown() -> None:
+    hub.close_all()
+    await pubsub.stop()
+
+
+async def publish(event_type: str, data: dict[str, Any]) -> None:
+    # Called after the write has committed; a failure to notify must not
+    # fail the request that made the change
+    try:
+        await pubsub.publish(format_event(event_type, data))
+        published.inc()
+    except Exception:
+        logger.exception(f"could not publish {event_type} event")
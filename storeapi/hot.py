@@ -0,0 +1,128 @@
+import asyncio
+import datetime
+import logging
+import math
+import time
+from typing import Iterable, Optional
+
+import sqlalchemy
+
+from storeapi import metrics
+from storeapi.config import config
+from storeapi.database import comment_table, database, post_table
+
+logger = logging.getLogger(__name__)
+
+# A post's hot score is log2(1 + likes + COMMENT_WEIGHT * comments) plus its
+# creation time in half-lives. A post HALF_LIFE_SECONDS older needs twice
+# the engagement to rank level with a newer one, but the score itself never
+# changes with time, so it only has to be recomputed when engagement does
+# and GET /post?sorting=hot is a scan of the posts.hot_score index.
+# Migration 0009 holds a copy of this formula; changing it needs a
+# migration that recomputes every post.
+HALF_LIFE_SECONDS = 12 * 60 * 60
+COMMENT_WEIGHT = 2
+# Posts recomputed per statement
+RECOMPUTE_CHUNK_SIZE = 500
+
+
+def hot_score(likes: int, comments: int, created_at: datetime.datetime) -> float:
+    if created_at.tzinfo is None:
+        # Stored by the database's now(), in UTC
+        created_at = created_at.replace(tzinfo=datetime.UTC)
+    engagement = likes + COMMENT_WEIGHT * comments
+    return math.log2(1 + engagement) + created_at.timestamp() / HALF_LIFE_SECONDS
+
+
+def initial_hot_score() -> float:
+    # For a post being created, with no likes or comments yet
+    return time.time() / HALF_LIFE_SECONDS
+
+
+# Plain SQL because databases' execute_many only binds parameters into text queries
+SET_HOT_SCORE = "UPDATE posts SET hot_score = :hot_score WHERE id = :post_id"
+
+
+async def recompute(post_ids: Iterable[int]) -> None:
+    post_ids = list(post_ids)
+    comment_count = (
+        sqlalchemy.select(sqlalchemy.func.count(comment_table.c.id))
+        .where(comment_table.c.post_id == post_table.c.id)
+        .scalar_subquery()
+    )
+    for start in range(0, len(post_ids), RECOMPUTE_CHUNK_SIZE):
+        chunk = post_ids[start : start + RECOMPUTE_CHUNK_SIZE]
+        rows = await database.fetch_all(
+            sqlalchemy.select(
+                post_table.c.id,
+                post_table.c.like_count,
+                post_table.c.created_at,
+                comment_count.label("comment_count"),
+            ).where(post_table.c.id.in_(chunk))
+        )
+        if rows:
+            await database.execute_many(
+                SET_HOT_SCORE,
+                [
+                    {
+                        "post_id": row["id"],
+                        "hot_score": hot_score(
+                            row["like_count"], row["comment_count"], row["created_at"]
+                        ),
+                    }
+                    for row in rows
+                ],
+            )
+
+
+class HotRanker:
+    # Collects the posts that gained or lost likes and comments, and
+    # recomputes their hot scores every `interval` seconds in the
+    # background, so the write requests don't wait for it
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._dirty: set[int] = set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.recomputed = metrics.counter("hot.recomputed_posts")
+        self.pending = metrics.gauge("hot.pending_posts")
+
+    def mark(self, post_id: int) -> None:
+        self._dirty.add(post_id)
+        self.pending.set(len(self._dirty))
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                return
+            try:
+                await recompute(dirty)
+            except Exception:
+                logger.exception(f"failed to recompute hot scores of {len(dirty)} posts")
+                # Retried with the next flush
+                self._dirty |= dirty
+            else:
+                self.recomputed.inc(len(dirty))
+            self.pending.set(len(self._dirty))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+hot_ranker = HotRanker(config.HOT_RECOMPUTE_INTERVAL_SECONDS)
@@ -0,0 +1,73 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from jose import jwk
+from jose.backends.base import Key
+
+# RSA and ECDSA signatures are made with a private key and checked with the
+# public one, which can be handed to other services
+ASYMMETRIC_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+
+def is_asymmetric(algorithm: str) -> bool:
+    return algorithm in ASYMMETRIC_ALGORITHMS
+
+
+def default_key_id(public_key: Key) -> str:
+    return hashlib.sha256(public_key.to_pem()).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class KeySet:
+    algorithm: str
+    # A string for HMAC algorithms, otherwise the parsed private key
+    signing_key: Any
+    key_id: Optional[str] = None
+    # Keys that verify tokens, by key id. Parsed once, since loading a PEM
+    # costs more than checking a signature.
+    verification_keys: dict[Optional[str], Any] = field(default_factory=dict)
+
+    @property
+    def headers(self) -> Optional[dict[str, str]]:
+        return {"kid": self.key_id} if self.key_id else None
+
+    def verification_key(self, key_id: Optional[str]) -> Optional[Any]:
+        if not is_asymmetric(self.algorithm):
+            return self.signing_key
+        return self.verification_keys.get(key_id)
+
+    def jwks(self) -> dict[str, list[dict[str, Any]]]:
+        # Shared secrets are never published
+        if not is_asymmetric(self.algorithm):
+            return {"keys": []}
+        return {
+            "keys": [
+                {**key.to_dict(), "kid": key_id, "use": "sig"}
+                for key_id, key in self.verification_keys.items()
+            ]
+        }
+
+
+def load_key_set(
+    algorithm: str,
+    secret_key: str,
+    private_key: Optional[str] = None,
+    key_id: Optional[str] = None,
+    public_keys: Optional[dict[str, str]] = None,
+) -> KeySet:
+    # public_keys are earlier keys (by key id) whose tokens are still
+    # accepted while they expire after a key rotation
+    if not is_asymmetric(algorithm):
+        return KeySet(algorithm, secret_key)
+    if not private_key:
+        raise ValueError(f"ALGORITHM={algorithm} requires JWT_PRIVATE_KEY")
+    signing_key = jwk.construct(private_key, algorithm)
+    public_key = signing_key.public_key()
+    key_id = key_id or default_key_id(public_key)
+    verification_keys = {
+        previous_id: jwk.construct(pem, algorithm)
+        for previous_id, pem in (public_keys or {}).items()
+    }
+    verification_keys[key_id] = public_key
+    return KeySet(algorithm, signing_key, key_id, verification_keys)
@@ -1,31 +1,91 @@
+import asyncio
 import logging
-from functools import lru_cache
+import threading
+from typing import BinaryIO, Optional
 import b2sdk.v2 as b2
 from storeapi.config import config
+from storeapi.libs.storage import StorageBackend,StorageUnavailable
 
 logger=logging.getLogger(__name__)
 
-@lru_cache()
-def b2_api():
-    logger.debug("creating and authorizing b2 api")
-    info=b2.InMemoryAccountInfo()
-    b2_api=b2.B2Api(info)
-
-    b2_api.authorize_account("production",config.B2_KEY_ID,config.B2_APPLICATION_KEY)
-    return b2_api
-
-@lru_cache()
-def b2_get_bucket(api:b2.B2Api):
-    return api.get_bucket_by_name(config.B2_BUCKET_NAME)
-
-def b2_upload_file(local_file:str,file_name:str):
-    api=b2_api()
-    logger.debug(f"uploading {local_file} to b2 as {file_name}")
-    uploaded_file=b2_get_bucket(api).upload_local_file(
-        local_file=local_file,file_name=file_name
-    )
-    download_url=api.get_download_url_for_fileid(uploaded_file.id_)
-    logger.debug(
-        f"Uploaded {local_file} to b2 successfully and got download url {download_url}"
-    )
-    return download_url
\ No newline at end of file
+class B2Storage(StorageBackend):
+    def __init__(self,key_id:str,application_key:str,bucket_name:str)->None:
+        self.key_id=key_id
+        self.application_key=application_key
+        self.bucket_name=bucket_name
+        self.api=b2.B2Api(b2.InMemoryAccountInfo())
+        self.bucket:Optional[b2.Bucket]=None
+        self._lock=threading.Lock()
+        self._refresh_task:Optional[asyncio.Task]=None
+
+    @property
+    def configured(self)->bool:
+        return bool(self.key_id and self.application_key and self.bucket_name)
+
+    def authorize(self)->b2.Bucket:
+        if not self.configured:
+            raise StorageUnavailable(
+                "STORAGE_BACKEND=b2 needs B2_KEY_ID, B2_APPLICATION_KEY and B2_BUCKET_NAME"
+            )
+        with self._lock:
+            logger.debug("authorizing b2 account")
+            self.api.authorize_account("production",self.key_id,self.application_key)
+            self.bucket=self.api.get_bucket_by_name(self.bucket_name)
+            return self.bucket
+
+    async def startup(self)->None:
+        if not self.configured:
+            # Only uploads need B2, so the API still starts; they get a 503
+            logger.error(
+                "STORAGE_BACKEND=b2 needs B2_KEY_ID, B2_APPLICATION_KEY and "
+                "B2_BUCKET_NAME; set STORAGE_BACKEND=local to store uploads on disk"
+            )
+            return
+        # Authorize before serving so no upload pays for the auth round trip,
+        # then renew the token ahead of its expiry in the background. If B2
+        # is down, the next upload tries again.
+        try:
+            await asyncio.to_thread(self.authorize)
+        except Exception:
+            logger.exception("authorizing b2 at startup failed, uploads will retry")
+        self._refresh_task=asyncio.create_task(self._refresh_authorization())
+
+    async def shutdown(self)->None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task=None
+
+    async def _refresh_authorization(self)->None:
+        while True:
+            await asyncio.sleep(config.B2_AUTH_REFRESH_SECONDS)
+            try:
+                await asyncio.to_thread(self.authorize)
+            except Exception:
+                # b2sdk re-authorizes on an expired token by itself, so a
+                # failed refresh only costs the next upload a round trip
+                logger.exception("refreshing b2 authorization failed")
+
+    def upload_stream(self,stream:BinaryIO,file_name:str)->str:
+        # Uploads from a file object of unknown length as a large file. b2sdk
+        # holds at most buffers_count parts of UPLOAD_PART_SIZE bytes in memory.
+        try:
+            bucket=self.bucket or self.authorize()
+        except StorageUnavailable:
+            raise
+        except Exception as e:
+            raise StorageUnavailable("could not authorize b2") from e
+        logger.debug(f"streaming upload to b2 as {file_name}")
+        uploaded_file=bucket.upload_unbound_stream(
+            stream,
+            file_name,
+            recommended_upload_part_size=config.UPLOAD_PART_SIZE,
+            buffer_size=config.UPLOAD_PART_SIZE,
+            buffers_count=2,
+        )
+        download_url=self.api.get_download_url_for_fileid(uploaded_file.id_)
+        logger.debug(f"Streamed {file_name} to b2 successfully and got download url {download_url}")
+        return download_url
@@ -0,0 +1,48 @@
+import io
+import logging
+import pathlib
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    name: str
+    # Longest side in pixels; smaller images are re-encoded but not upscaled
+    max_size: int
+    format: str
+    extension: str
+    quality: int
+
+
+VARIANTS = (
+    ImageVariant("thumbnail", 320, "JPEG", "jpg", 80),
+    ImageVariant("feed", 1080, "JPEG", "jpg", 85),
+    ImageVariant("webp", 1080, "WEBP", "webp", 80),
+)
+
+
+def variant_file_name(file_name: str, variant: ImageVariant) -> str:
+    # Stored next to the original: photo.png -> photo.thumbnail.jpg
+    return f"{pathlib.PurePath(file_name).stem}.{variant.name}.{variant.extension}"
+
+
+def render_variants(data: bytes) -> dict[str, bytes]:
+    # CPU bound; run in a process pool. Raises PIL's errors for data that is
+    # not an image or is too large to decode safely.
+    with Image.open(io.BytesIO(data)) as original:
+        original.load()
+        image = ImageOps.exif_transpose(original)
+    rendered = {}
+    for variant in VARIANTS:
+        resized = image.copy()
+        resized.thumbnail((variant.max_size, variant.max_size), Image.Resampling.LANCZOS)
+        if variant.format == "JPEG" and resized.mode != "RGB":
+            resized = resized.convert("RGB")
+        output = io.BytesIO()
+        resized.save(output, variant.format, quality=variant.quality, optimize=True)
+        rendered[variant.name] = output.getvalue()
+    return rendered
@@ -0,0 +1,24 @@
+import logging
+import pathlib
+import shutil
+from typing import BinaryIO
+
+from storeapi.libs.storage import StorageBackend
+
+logger=logging.getLogger(__name__)
+
+class LocalStorage(StorageBackend):
+    # Files on the local filesystem, for development and offline tests
+    def __init__(self,directory:str)->None:
+        self.directory=pathlib.Path(directory).resolve()
+
+    async def startup(self)->None:
+        self.directory.mkdir(parents=True,exist_ok=True)
+
+    def upload_stream(self,stream:BinaryIO,file_name:str)->str:
+        self.directory.mkdir(parents=True,exist_ok=True)
+        path=self.directory/pathlib.Path(file_name).name
+        logger.debug(f"writing upload {file_name} to {path}")
+        with open(path,"wb") as f:
+            shutil.copyfileobj(stream,f)
+        return path.as_uri()
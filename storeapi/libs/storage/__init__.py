@@ -0,0 +1,56 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import BinaryIO
+
+from storeapi.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class StorageUnavailable(Exception):
+    # The storage service can't be reached or isn't configured; uploads get
+    # a 503 while the rest of the API keeps serving
+    pass
+
+
+class StorageBackend(ABC):
+    # Object storage for uploaded files. upload_stream blocks and is run in
+    # the upload thread pool; startup/shutdown run in the app lifespan.
+    async def startup(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @abstractmethod
+    def upload_stream(self, stream: BinaryIO, file_name: str) -> str:
+        # Stores everything read from `stream` and returns its download url
+        ...
+
+
+class MemoryStorage(StorageBackend):
+    def __init__(self) -> None:
+        self.files: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def upload_stream(self, stream: BinaryIO, file_name: str) -> str:
+        data = stream.read()
+        with self._lock:
+            self.files[file_name] = data
+        return f"memory://{file_name}"
+
+
+@lru_cache()
+def get_storage() -> StorageBackend:
+    logger.debug(f"using {config.STORAGE_BACKEND} storage")
+    if config.STORAGE_BACKEND == "b2":
+        from storeapi.libs.b2 import B2Storage
+
+        return B2Storage(config.B2_KEY_ID, config.B2_APPLICATION_KEY, config.B2_BUCKET_NAME)
+    if config.STORAGE_BACKEND == "local":
+        from storeapi.libs.local import LocalStorage
+
+        return LocalStorage(config.LOCAL_STORAGE_DIR)
+    return MemoryStorage()
@@ -0,0 +1,96 @@
+import asyncio
+import io
+import logging
+import queue
+from concurrent.futures import Executor
+from typing import BinaryIO, Callable, TypeVar
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_EOF = object()
+
+
+class ChunkQueueReader(io.RawIOBase):
+    # Blocking, read-only file object fed with chunks from the event loop.
+    # At most `max_chunks` chunks are buffered: put() waits for the reading
+    # thread to take one before accepting more.
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int) -> None:
+        self._loop = loop
+        self._chunks: queue.SimpleQueue = queue.SimpleQueue()
+        self._slots = asyncio.Semaphore(max_chunks)
+        self._max_chunks = max_chunks
+        self._current = memoryview(b"")
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    async def put(self, chunk: bytes) -> None:
+        await self._slots.acquire()
+        self._chunks.put(chunk)
+
+    def close_writer(self) -> None:
+        self._chunks.put(_EOF)
+
+    def abort(self, error: BaseException) -> None:
+        self._chunks.put(error)
+
+    def release_writer(self) -> None:
+        # Called from the reading thread once it stops reading, so a writer
+        # waiting for a free slot doesn't wait forever.
+        for _ in range(self._max_chunks):
+            self._loop.call_soon_threadsafe(self._slots.release)
+
+    def readinto(self, buffer) -> int:
+        while not self._current and not self._eof:
+            item = self._chunks.get()
+            if item is _EOF:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                self._current = memoryview(item)
+                self._loop.call_soon_threadsafe(self._slots.release)
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+
+async def stream_upload(
+    file: UploadFile,
+    sink: Callable[[BinaryIO], T],
+    executor: Executor,
+    chunk_size: int,
+    max_buffered_chunks: int,
+) -> T:
+    # Runs the blocking `sink` in `executor` while this coroutine feeds it the
+    # upload chunk by chunk, holding at most max_buffered_chunks in memory.
+    loop = asyncio.get_running_loop()
+    reader = ChunkQueueReader(loop, max_buffered_chunks)
+
+    def consume() -> T:
+        try:
+            return sink(reader)
+        finally:
+            reader.release_writer()
+
+    upload = loop.run_in_executor(executor, consume)
+    try:
+        while chunk := await file.read(chunk_size):
+            if upload.done():
+                # The sink stopped early; its result or error is raised below
+                break
+            await reader.put(chunk)
+    except BaseException as e:
+        reader.abort(ConnectionAbortedError("upload was interrupted"))
+        # Nobody awaits the sink any more; collect its error so it isn't reported
+        upload.add_done_callback(lambda future: future.exception())
+        logger.debug(f"aborting streamed upload of {file.filename}: {e!r}")
+        raise
+    reader.close_writer()
+    return await upload
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from storeapi import metrics
+from storeapi.config import config
+from storeapi.database import database, like_table, post_table, supports_returning
+
+logger = logging.getLogger(__name__)
+
+LikeKey = tuple[int, int]  # (post_id, user_id)
+
+
+@dataclass(frozen=True)
+class LikeResult:
+    like_id: int
+    # False when the user had already liked the post
+    created: bool
+
+
+def insert_likes_ignoring_duplicates(keys: list[LikeKey]):
+    dialect = postgresql if database.url.dialect == "postgresql" else sqlite
+    return (
+        dialect.insert(like_table)
+        .values([{"post_id": post_id, "user_id": user_id} for post_id, user_id in keys])
+        .on_conflict_do_nothing(index_elements=["post_id", "user_id"])
+    )
+
+
+async def fetch_like_ids(keys: list[LikeKey]) -> dict[LikeKey, int]:
+    rows = await database.fetch_all(
+        sqlalchemy.select(like_table.c.id, like_table.c.post_id, like_table.c.user_id).where(
+            sqlalchemy.tuple_(like_table.c.post_id, like_table.c.user_id).in_(keys)
+        )
+    )
+    return {(row["post_id"], row["user_id"]): row["id"] for row in rows}
+
+
+async def insert_likes(keys: list[LikeKey]) -> dict[LikeKey, int]:
+    # Ids of the likes this inserted, leaving out pairs that were already liked
+    insert = insert_likes_ignoring_duplicates(keys)
+    if supports_returning():
+        rows = await database.fetch_all(
+            insert.returning(like_table.c.id, like_table.c.post_id, like_table.c.user_id)
+        )
+        return {(row["post_id"], row["user_id"]): row["id"] for row in rows}
+    existing = await fetch_like_ids(keys)
+    await database.execute(insert)
+    return {
+        key: like_id
+        for key, like_id in (await fetch_like_ids(keys)).items()
+        if key not in existing
+    }
+
+
+# Applies a batch's new likes to a post's counter in one statement. Plain
+# SQL because databases' execute_many only binds parameters into text queries.
+ADD_TO_LIKE_COUNT = (
+    "UPDATE posts SET like_count = like_count + :new_likes, version = version + 1 "
+    "WHERE id = :post_id"
+)
+
+
+async def write_likes(keys: list[LikeKey]) -> dict[LikeKey, LikeResult]:
+    # Likes a set of posts in one transaction. Already liked pairs are left
+    # as they are, and pairs whose post doesn't exist are missing from the
+    # result.
+    post_ids = {post_id for post_id, _ in keys}
+    async with database.transaction():
+        existing_posts = {
+            row["id"]
+            for row in await database.fetch_all(
+                sqlalchemy.select(post_table.c.id).where(post_table.c.id.in_(post_ids))
+            )
+        }
+        keys = [key for key in keys if key[0] in existing_posts]
+        if not keys:
+            return {}
+        results = {
+            key: LikeResult(like_id, True) for key, like_id in (await insert_likes(keys)).items()
+        }
+        new_likes = Counter(post_id for post_id, _ in results)
+        if new_likes:
+            await database.execute_many(
+                ADD_TO_LIKE_COUNT,
+                [
+                    {"post_id": post_id, "new_likes": count}
+                    for post_id, count in new_likes.items()
+                ],
+            )
+        duplicates = [key for key in keys if key not in results]
+        if duplicates:
+            for key, like_id in (await fetch_like_ids(duplicates)).items():
+                results[key] = LikeResult(like_id, False)
+    return results
+
+
+async def remove_like(post_id: int, user_id: int) -> bool:
+    # False when there was no like to remove
+    where = (like_table.c.post_id == post_id, like_table.c.user_id == user_id)
+    async with database.transaction():
+        if supports_returning():
+            deleted = await database.fetch_val(
+                like_table.delete().where(*where).returning(like_table.c.id)
+            )
+        else:
+            deleted = await database.fetch_val(sqlalchemy.select(like_table.c.id).where(*where))
+            if deleted is not None:
+                await database.execute(like_table.delete().where(*where))
+        if deleted is None:
+            return False
+        await database.execute(
+            post_table.update()
+            .where(post_table.c.id == post_id)
+            .values(
+                like_count=post_table.c.like_count - 1,
+                version=post_table.c.version + 1,
+            )
+        )
+    return True
+
+
+class LikeBuffer:
+    # Coalesces likes arriving within `interval` seconds (or until
+    # `max_size` are pending) into one write_likes() transaction. Callers
+    # wait for the batch to commit, so a like is durable once it is answered.
+    def __init__(self, interval: float, max_size: int) -> None:
+        self.interval = interval
+        self.max_size = max_size
+        self._pending: dict[LikeKey, asyncio.Future] = {}
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: set[asyncio.Task] = set()
+        self.batches = metrics.counter("like_buffer.batches")
+        self.batched_likes = metrics.counter("like_buffer.likes")
+
+    async def add(self, post_id: int, user_id: int) -> Optional[LikeResult]:
+        loop = asyncio.get_running_loop()
+        key = (post_id, user_id)
+        future = self._pending.get(key)
+        first = future is None
+        if first:
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_size:
+                self._schedule_flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.interval, self._schedule_flush)
+        # Shielded: a client that disconnects doesn't cancel the batch
+        result = await asyncio.shield(future)
+        if result and not first:
+            # Repeats of a like in the same batch found it already made
+            return replace(result, created=False)
+        return result
+
+    def _schedule_flush(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        task = asyncio.create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            self.batches.inc()
+            self.batched_likes.inc(len(pending))
+            try:
+                results = await write_likes(list(pending))
+            except Exception as e:
+                logger.exception(f"failed to write a batch of {len(pending)} likes")
+                for future in pending.values():
+                    future.set_exception(e)
+                return
+            for key, future in pending.items():
+                future.set_result(results.get(key))
+
+    async def close(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await asyncio.gather(*self._flushes)
+        await self.flush()
+
+
+like_buffer = LikeBuffer(config.LIKE_BUFFER_INTERVAL_SECONDS, config.LIKE_BUFFER_MAX_SIZE)
+
+
+async def like(post_id: int, user_id: int) -> Optional[LikeResult]:
+    # None when the post doesn't exist
+    if config.LIKE_BUFFER_ENABLED:
+        return await like_buffer.add(post_id, user_id)
+    results = await write_likes([(post_id, user_id)])
+    return results.get((post_id, user_id))
+
+
+async def unlike(post_id: int, user_id: int) -> bool:
+    if config.LIKE_BUFFER_ENABLED:
+        # A like still waiting in the buffer must not land after its unlike
+        await like_buffer.flush()
+    return await remove_like(post_id, user_id)
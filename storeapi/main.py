@@ -5,10 +5,22 @@ from asgi_correlation_id import CorrelationIdMiddleware
 from fastapi import FastAPI, HTTPException
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from storeapi.database import database
+from storeapi import events, replicas
+from storeapi.database import PoolTimeout, database
+from storeapi.hot import hot_ranker
+from storeapi.libs.storage import get_storage
+from storeapi.likes import like_buffer
 from storeapi.logging_conf import configure_logging
+from storeapi.migrations import check_schema_version
+from storeapi.pagination import NEXT_CURSOR_HEADER
+from storeapi.routers.events import router as events_router
+from storeapi.routers.keys import router as keys_router
+from storeapi.routers.metrics import router as metrics_router
 from storeapi.routers.post import router as post_router
+from storeapi.routers.search import router as search_router
+from storeapi.routers.upload import image_executor
 from storeapi.routers.upload import router as upload_router
 from storeapi.routers.user import router as user_router
 
@@ -19,7 +31,20 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     configure_logging()
     await database.connect()
+    await check_schema_version(database)
+    await replicas.connect()
+    await get_storage().startup()
+    await events.startup()
+    hot_ranker.start()
     yield
+    # Write likes still waiting for their batch before the database goes
+    await like_buffer.close()
+    await hot_ranker.stop()
+    await events.shutdown()
+    await get_storage().shutdown()
+    # Stop the image worker processes rather than leaving them to exit with us
+    image_executor.shutdown(cancel_futures=True)
+    await replicas.disconnect()
     await database.disconnect()
 
 
@@ -35,10 +60,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 
+app.include_router(events_router)
+app.include_router(keys_router)
+app.include_router(metrics_router)
 app.include_router(post_router)
+app.include_router(search_router)
 app.include_router(upload_router)
 app.include_router(user_router)
 
@@ -47,3 +77,14 @@ app.include_router(user_router)
 async def http_exception_handle_logging(request, exc):
     logger.error(f"HTTPException: {exc.status_code} {exc.detail}")
     return await http_exception_handler(request, exc)
+
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request, exc):
+    # Every pooled connection stayed busy; ask the client to back off
+    logger.error("database pool exhausted")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "database busy, try again"},
+        headers={"Retry-After": "1"},
+    )
@@ -0,0 +1,57 @@
+import logging
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Counter:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class Gauge:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.value = 0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+
+_metrics: dict[str, Counter | Gauge] = {}
+# Collectors compute values at read time, e.g. ratios or pool sizes
+_collectors: dict[str, Callable[[], dict[str, float]]] = {}
+
+
+def counter(name: str) -> Counter:
+    metric = _metrics.setdefault(name, Counter(name))
+    assert isinstance(metric, Counter), f"{name} is already registered as a gauge"
+    return metric
+
+
+def gauge(name: str) -> Gauge:
+    metric = _metrics.setdefault(name, Gauge(name))
+    assert isinstance(metric, Gauge), f"{name} is already registered as a counter"
+    return metric
+
+
+def register_collector(name: str, collect: Callable[[], dict[str, float]]) -> None:
+    _collectors[name] = collect
+
+
+def snapshot() -> dict[str, float]:
+    values = {name: metric.value for name, metric in _metrics.items()}
+    for prefix, collect in _collectors.items():
+        for name, value in collect().items():
+            values[f"{prefix}.{name}"] = value
+    return dict(sorted(values.items()))
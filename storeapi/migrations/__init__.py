@@ -0,0 +1,113 @@
+import importlib
+import logging
+import pkgutil
+from types import ModuleType
+
+import databases
+
+from storeapi.migrations import versions
+
+logger = logging.getLogger(__name__)
+
+# Each module in storeapi/migrations/versions defines VERSION (consecutive
+# integers starting at 1), DESCRIPTION and `async def upgrade(db)`. Applied
+# versions are recorded in the schema_version table.
+create_schema_version_table = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def load_migrations() -> list[ModuleType]:
+    migrations = [
+        importlib.import_module(f"{versions.__name__}.{module.name}")
+        for module in pkgutil.iter_modules(versions.__path__)
+    ]
+    migrations.sort(key=lambda migration: migration.VERSION)
+    for expected, migration in enumerate(migrations, start=1):
+        if migration.VERSION != expected:
+            raise SchemaVersionError(
+                f"migration {migration.__name__} has version {migration.VERSION}, expected {expected}"
+            )
+    return migrations
+
+
+def head_version() -> int:
+    return len(load_migrations())
+
+
+async def table_exists(db: databases.Database, table: str) -> bool:
+    if db.url.dialect == "sqlite":
+        query = "SELECT name FROM sqlite_master WHERE type = 'table' AND name = :table"
+    else:
+        query = "SELECT table_name FROM information_schema.tables WHERE table_name = :table"
+    return await db.fetch_one(query, {"table": table}) is not None
+
+
+async def column_exists(db: databases.Database, table: str, column: str) -> bool:
+    if db.url.dialect == "sqlite":
+        rows = await db.fetch_all(f"PRAGMA table_info({table})")
+        return column in [row["name"] for row in rows]
+    query = (
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = :table AND column_name = :column"
+    )
+    return await db.fetch_one(query, {"table": table, "column": column}) is not None
+
+
+async def current_version(db: databases.Database) -> int:
+    if not await table_exists(db, "schema_version"):
+        return 0
+    version = await db.fetch_val("SELECT max(version) FROM schema_version")
+    return version or 0
+
+
+async def upgrade(db: databases.Database, target: int | None = None) -> list[int]:
+    await db.execute(create_schema_version_table)
+    version = await current_version(db)
+    applied = []
+    for migration in load_migrations():
+        if migration.VERSION <= version:
+            continue
+        if target is not None and migration.VERSION > target:
+            break
+        logger.info(f"applying migration {migration.VERSION}: {migration.DESCRIPTION}")
+        async with db.transaction():
+            await migration.upgrade(db)
+            await db.execute(
+                "INSERT INTO schema_version (version, description) VALUES (:version, :description)",
+                {"version": migration.VERSION, "description": migration.DESCRIPTION},
+            )
+        applied.append(migration.VERSION)
+    return applied
+
+
+async def upgrade_database(url: str, target: int | None = None) -> list[int]:
+    # Migrations run on their own connection so they are never caught up in
+    # the application's force_rollback transaction.
+    db = databases.Database(url)
+    await db.connect()
+    try:
+        return await upgrade(db, target)
+    finally:
+        await db.disconnect()
+
+
+async def check_schema_version(db: databases.Database) -> None:
+    # Workers only verify the schema; applying migrations is an explicit
+    # deploy step (python -m storeapi.migrations upgrade).
+    version = await current_version(db)
+    head = head_version()
+    if version != head:
+        raise SchemaVersionError(
+            f"database schema is at version {version}, expected {head}; "
+            "run `python -m storeapi.migrations upgrade`"
+        )
+    logger.debug(f"database schema is at version {version}")
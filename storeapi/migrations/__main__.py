@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import sys
+
+import databases
+
+from storeapi.config import config
+from storeapi.migrations import (
+    SchemaVersionError,
+    check_schema_version,
+    current_version,
+    head_version,
+    upgrade_database,
+)
+
+
+async def show_current(url: str) -> None:
+    db = databases.Database(url)
+    await db.connect()
+    try:
+        print(f"current: {await current_version(db)}, head: {head_version()}")
+    finally:
+        await db.disconnect()
+
+
+async def check(url: str) -> None:
+    db = databases.Database(url)
+    await db.connect()
+    try:
+        await check_schema_version(db)
+    finally:
+        await db.disconnect()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m storeapi.migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subparsers.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, help="stop at this version")
+    subparsers.add_parser("current", help="show the applied and latest versions")
+    subparsers.add_parser("check", help="exit non-zero if migrations are pending")
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        applied = asyncio.run(upgrade_database(config.DATABASE_URL, args.to))
+        print(f"applied migrations: {applied}" if applied else "database is up to date")
+    elif args.command == "current":
+        asyncio.run(show_current(config.DATABASE_URL))
+    elif args.command == "check":
+        try:
+            asyncio.run(check(config.DATABASE_URL))
+        except SchemaVersionError as e:
+            sys.exit(str(e))
+        print("database is up to date")
+
+
+if __name__ == "__main__":
+    main()
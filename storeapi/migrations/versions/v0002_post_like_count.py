@@ -0,0 +1,16 @@
+import databases
+
+from storeapi.migrations import column_exists
+
+VERSION = 2
+DESCRIPTION = "denormalized posts.like_count"
+
+
+async def upgrade(db: databases.Database) -> None:
+    if not await column_exists(db, "posts", "like_count"):
+        await db.execute("ALTER TABLE posts ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0")
+    await db.execute(
+        "UPDATE posts SET like_count = "
+        "(SELECT count(likes.id) FROM likes WHERE likes.post_id = posts.id)"
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS ix_posts_like_count_id ON posts (like_count, id)")
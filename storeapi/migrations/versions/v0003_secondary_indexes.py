@@ -0,0 +1,23 @@
+import databases
+
+VERSION = 3
+DESCRIPTION = "foreign key indexes and one like per user and post"
+
+
+async def upgrade(db: databases.Database) -> None:
+    # Duplicate likes would block the unique index and inflate like_count
+    await db.execute(
+        "DELETE FROM likes WHERE id NOT IN "
+        "(SELECT min(id) FROM likes GROUP BY post_id, user_id)"
+    )
+    await db.execute(
+        "UPDATE posts SET like_count = "
+        "(SELECT count(likes.id) FROM likes WHERE likes.post_id = posts.id)"
+    )
+    await db.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_likes_post_id_user_id ON likes (post_id, user_id)"
+    )
+    await db.execute("CREATE INDEX IF NOT EXISTS ix_likes_user_id ON likes (user_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS ix_posts_user_id_id ON posts (user_id, id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS ix_comments_post_id_id ON comments (post_id, id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS ix_comments_user_id ON comments (user_id)")
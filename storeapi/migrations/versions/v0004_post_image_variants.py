@@ -0,0 +1,11 @@
+import databases
+
+from storeapi.migrations import column_exists
+
+VERSION = 4
+DESCRIPTION = "posts.image_variants"
+
+
+async def upgrade(db: databases.Database) -> None:
+    if not await column_exists(db, "posts", "image_variants"):
+        await db.execute("ALTER TABLE posts ADD COLUMN image_variants JSON")
@@ -0,0 +1,11 @@
+import databases
+
+from storeapi.migrations import column_exists
+
+VERSION = 5
+DESCRIPTION = "posts.version for ETags"
+
+
+async def upgrade(db: databases.Database) -> None:
+    if not await column_exists(db, "posts", "version"):
+        await db.execute("ALTER TABLE posts ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
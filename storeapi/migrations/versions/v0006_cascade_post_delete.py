@@ -0,0 +1,37 @@
+import databases
+
+VERSION = 6
+DESCRIPTION = "delete a post's comments and likes with it"
+
+# Postgres: the post_id foreign keys become ON DELETE CASCADE. SQLite can't
+# alter a foreign key without rebuilding the table, and only enforces them
+# with PRAGMA foreign_keys, so a trigger does the same there.
+find_post_foreign_key = """
+SELECT tc.constraint_name FROM information_schema.table_constraints tc
+JOIN information_schema.key_column_usage kcu
+    ON kcu.constraint_name = tc.constraint_name AND kcu.table_name = tc.table_name
+WHERE tc.constraint_type = 'FOREIGN KEY' AND tc.table_name = :table
+    AND kcu.column_name = 'post_id'
+"""
+
+create_sqlite_trigger = """
+CREATE TRIGGER IF NOT EXISTS posts_delete_cascade AFTER DELETE ON posts
+BEGIN
+    DELETE FROM likes WHERE post_id = OLD.id;
+    DELETE FROM comments WHERE post_id = OLD.id;
+END
+"""
+
+
+async def upgrade(db: databases.Database) -> None:
+    if db.url.dialect == "sqlite":
+        await db.execute(create_sqlite_trigger)
+        return
+    for table in ("comments", "likes"):
+        constraint = await db.fetch_val(find_post_foreign_key, {"table": table})
+        if constraint:
+            await db.execute(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}")
+        await db.execute(
+            f"ALTER TABLE {table} ADD CONSTRAINT {table}_post_id_fkey "
+            "FOREIGN KEY (post_id) REFERENCES posts (id) ON DELETE CASCADE"
+        )
@@ -0,0 +1,58 @@
+import databases
+import sqlalchemy
+
+from storeapi.migrations import column_exists
+
+VERSION = 7
+DESCRIPTION = "follows, users.follower_count and the home timeline"
+
+metadata = sqlalchemy.MetaData()
+
+users = sqlalchemy.Table(
+    "users", metadata, sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True)
+)
+posts = sqlalchemy.Table(
+    "posts", metadata, sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True)
+)
+
+follows = sqlalchemy.Table(
+    "follows",
+    metadata,
+    sqlalchemy.Column("follower_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("followee_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
+)
+
+timeline = sqlalchemy.Table(
+    "timeline",
+    metadata,
+    sqlalchemy.Column("user_id", sqlalchemy.ForeignKey("users.id"), primary_key=True),
+    sqlalchemy.Column(
+        "post_id",
+        sqlalchemy.ForeignKey("posts.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+)
+
+# As in migration 0006, SQLite doesn't enforce the cascade
+create_sqlite_trigger = """
+CREATE TRIGGER IF NOT EXISTS posts_delete_timeline AFTER DELETE ON posts
+BEGIN
+    DELETE FROM timeline WHERE post_id = OLD.id;
+END
+"""
+
+
+async def upgrade(db: databases.Database) -> None:
+    for table in (follows, timeline):
+        await db.execute(sqlalchemy.schema.CreateTable(table, if_not_exists=True))
+    # Fan-out finds an author's followers
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS ix_follows_followee_id ON follows (followee_id, follower_id)"
+    )
+    if not await column_exists(db, "users", "follower_count"):
+        await db.execute(
+            "ALTER TABLE users ADD COLUMN follower_count INTEGER NOT NULL DEFAULT 0"
+        )
+    if db.url.dialect == "sqlite":
+        await db.execute(create_sqlite_trigger)
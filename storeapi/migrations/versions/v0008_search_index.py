@@ -0,0 +1,134 @@
+import databases
+
+from storeapi.migrations import table_exists
+
+VERSION = 8
+DESCRIPTION = "full-text index over post and comment bodies"
+
+# search_documents holds one row per post and comment, kept in sync by
+# triggers so every write path (batches, edits, cascading deletes) updates
+# it. A document's id is the post id * 2, or the comment id * 2 + 1, so a
+# trigger finds its row by primary key. SQLite indexes it with FTS5 and
+# PostgreSQL with a GIN index on a generated tsvector.
+create_sqlite_table = """
+CREATE VIRTUAL TABLE search_documents USING fts5(
+    body, kind UNINDEXED, ref_id UNINDEXED, post_id UNINDEXED,
+    tokenize = 'porter unicode61'
+)
+"""
+
+sqlite_triggers = [
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_insert AFTER INSERT ON posts
+    BEGIN
+        INSERT INTO search_documents (rowid, body, kind, ref_id, post_id)
+        VALUES (NEW.id * 2, NEW.body, 'post', NEW.id, NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_update AFTER UPDATE OF body ON posts
+    BEGIN
+        UPDATE search_documents SET body = NEW.body WHERE rowid = NEW.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_delete AFTER DELETE ON posts
+    BEGIN
+        DELETE FROM search_documents WHERE rowid = OLD.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS comments_search_insert AFTER INSERT ON comments
+    BEGIN
+        INSERT INTO search_documents (rowid, body, kind, ref_id, post_id)
+        VALUES (NEW.id * 2 + 1, NEW.body, 'comment', NEW.id, NEW.post_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS comments_search_update AFTER UPDATE OF body ON comments
+    BEGIN
+        UPDATE search_documents SET body = NEW.body WHERE rowid = NEW.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS comments_search_delete AFTER DELETE ON comments
+    BEGIN
+        DELETE FROM search_documents WHERE rowid = OLD.id * 2 + 1;
+    END
+    """,
+]
+
+create_postgres_table = """
+CREATE TABLE IF NOT EXISTS search_documents (
+    id BIGINT PRIMARY KEY,
+    kind VARCHAR NOT NULL,
+    ref_id INTEGER NOT NULL,
+    post_id INTEGER NOT NULL,
+    body TEXT,
+    document TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(body, ''))) STORED
+)
+"""
+
+create_postgres_index = (
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_document "
+    "ON search_documents USING GIN (document)"
+)
+
+# (table, kind, document id, post id)
+postgres_sources = [
+    ("posts", "post", "{row}.id * 2", "{row}.id"),
+    ("comments", "comment", "{row}.id * 2 + 1", "{row}.post_id"),
+]
+
+postgres_sync_function = """
+CREATE OR REPLACE FUNCTION {table}_search_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM search_documents WHERE id = {old_id};
+        RETURN OLD;
+    END IF;
+    INSERT INTO search_documents (id, kind, ref_id, post_id, body)
+    VALUES ({new_id}, '{kind}', NEW.id, {new_post_id}, NEW.body)
+    ON CONFLICT (id) DO UPDATE SET body = EXCLUDED.body;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+backfill = """
+INSERT INTO search_documents ({id_column}, body, kind, ref_id, post_id)
+SELECT id * 2, body, 'post', id, id FROM posts
+UNION ALL
+SELECT id * 2 + 1, body, 'comment', id, post_id FROM comments
+"""
+
+
+async def upgrade(db: databases.Database) -> None:
+    if db.url.dialect == "sqlite":
+        if not await table_exists(db, "search_documents"):
+            await db.execute(create_sqlite_table)
+            await db.execute(backfill.format(id_column="rowid"))
+        for trigger in sqlite_triggers:
+            await db.execute(trigger)
+        return
+
+    if not await table_exists(db, "search_documents"):
+        await db.execute(create_postgres_table)
+        await db.execute(backfill.format(id_column="id"))
+    await db.execute(create_postgres_index)
+    for table, kind, document_id, post_id in postgres_sources:
+        await db.execute(
+            postgres_sync_function.format(
+                table=table,
+                kind=kind,
+                old_id=document_id.format(row="OLD"),
+                new_id=document_id.format(row="NEW"),
+                new_post_id=post_id.format(row="NEW"),
+            )
+        )
+        await db.execute(f"DROP TRIGGER IF EXISTS {table}_search_sync ON {table}")
+        await db.execute(
+            f"CREATE TRIGGER {table}_search_sync "
+            f"AFTER INSERT OR UPDATE OF body OR DELETE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {table}_search_sync()"
+        )
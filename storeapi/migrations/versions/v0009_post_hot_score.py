@@ -0,0 +1,74 @@
+import datetime
+import math
+
+import databases
+import sqlalchemy
+
+from storeapi.migrations import column_exists
+
+VERSION = 9
+DESCRIPTION = "posts.hot_score for the hot feed"
+
+# Frozen copy of storeapi.hot.hot_score
+HALF_LIFE_SECONDS = 12 * 60 * 60
+COMMENT_WEIGHT = 2
+
+metadata = sqlalchemy.MetaData()
+
+posts = sqlalchemy.Table(
+    "posts",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime),
+    sqlalchemy.Column("like_count", sqlalchemy.Integer),
+)
+
+comments = sqlalchemy.Table(
+    "comments",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("post_id", sqlalchemy.Integer),
+)
+
+
+def hot_score(likes: int, comments: int, created_at: datetime.datetime) -> float:
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=datetime.UTC)
+    engagement = likes + COMMENT_WEIGHT * comments
+    return math.log2(1 + engagement) + created_at.timestamp() / HALF_LIFE_SECONDS
+
+
+async def upgrade(db: databases.Database) -> None:
+    if not await column_exists(db, "posts", "hot_score"):
+        await db.execute("ALTER TABLE posts ADD COLUMN hot_score FLOAT NOT NULL DEFAULT 0")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS ix_posts_hot_score_id ON posts (hot_score, id)"
+    )
+    comment_count = (
+        sqlalchemy.select(sqlalchemy.func.count(comments.c.id))
+        .where(comments.c.post_id == posts.c.id)
+        .scalar_subquery()
+    )
+    rows = await db.fetch_all(
+        sqlalchemy.select(
+            posts.c.id,
+            posts.c.like_count,
+            posts.c.created_at,
+            comment_count.label("comment_count"),
+        )
+    )
+    if rows:
+        await db.execute_many(
+            "UPDATE posts SET hot_score = :hot_score WHERE id = :post_id",
+            [
+                {
+                    "post_id": row["id"],
+                    "hot_score": hot_score(
+                        row["like_count"],
+                        row["comment_count"],
+                        row["created_at"] or datetime.datetime.now(datetime.UTC),
+                    ),
+                }
+                for row in rows
+            ],
+        )
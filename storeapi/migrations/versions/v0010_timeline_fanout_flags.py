@@ -0,0 +1,33 @@
+import databases
+
+from storeapi.config import config
+from storeapi.migrations import column_exists
+
+VERSION = 10
+DESCRIPTION = "posts.fanned_out, users.has_unfanned_posts and own posts in timelines"
+
+
+async def upgrade(db: databases.Database) -> None:
+    if not await column_exists(db, "posts", "fanned_out"):
+        await db.execute("ALTER TABLE posts ADD COLUMN fanned_out BOOLEAN NOT NULL DEFAULT TRUE")
+    if not await column_exists(db, "users", "has_unfanned_posts"):
+        await db.execute(
+            "ALTER TABLE users ADD COLUMN has_unfanned_posts BOOLEAN NOT NULL DEFAULT FALSE"
+        )
+    # Posts of authors over the fan-out limit were never copied to their
+    # followers' timelines
+    await db.execute(
+        "UPDATE posts SET fanned_out = FALSE WHERE user_id IN "
+        "(SELECT id FROM users WHERE follower_count > :max_followers)",
+        {"max_followers": config.TIMELINE_FANOUT_MAX_FOLLOWERS},
+    )
+    await db.execute(
+        "UPDATE users SET has_unfanned_posts = TRUE WHERE EXISTS "
+        "(SELECT 1 FROM posts WHERE posts.user_id = users.id AND NOT posts.fanned_out)"
+    )
+    # Timelines now hold their owner's posts too
+    await db.execute(
+        "INSERT INTO timeline (user_id, post_id) SELECT user_id, id FROM posts "
+        "WHERE NOT EXISTS (SELECT 1 FROM timeline "
+        "WHERE timeline.user_id = posts.user_id AND timeline.post_id = posts.id)"
+    )
@@ -1,15 +1,21 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 
 class UserPostIn(BaseModel):
     body: str
 
+class UserPostCreate(UserPostIn):
+    # file_url and variants from a previous /upload
+    image_url: Optional[str] = None
+    image_variants: Optional[dict[str, str]] = None
+
 class UserPost(UserPostIn):
     model_config = ConfigDict(from_attributes=True)
     id: int
     user_id: int
     image_url: Optional[str] = None
+    image_variants: Optional[dict[str, str]] = None
     created_at: datetime
 
 class UserPostWithLikes(UserPost):
@@ -17,6 +23,11 @@ class UserPostWithLikes(UserPost):
     likes: int
     username: str  # Add username
 
+class UserPostWithExtras(UserPostWithLikes):
+    # Feed rows; each field is only present when asked for with ?include=
+    comment_count: Optional[int] = None
+    liked_by_me: Optional[bool] = None
+
 class CommentIn(BaseModel):
     body: str
     post_id: int
@@ -30,11 +41,31 @@ class Comment(CommentIn):
 
 class UserPostWithComments(BaseModel):
     post: UserPostWithLikes
+    # The first page of comments; fetch the rest from
+    # /post/{post_id}/comment?after=next_comments_cursor
     comments: list[Comment]
+    comment_count: int
+    next_comments_cursor: Optional[str] = None
+
+class BatchItemResult(BaseModel):
+    # One per submitted item, in order: the new row's id, or why it failed
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class PostsDeleted(BaseModel):
+    # Requested ids that were missing or not the user's are left out
+    deleted: list[int]
 
 class PostLikeIn(BaseModel):
     post_id: int
 
 class PostLike(PostLikeIn):
     id: int
-    user_id: int
\ No newline at end of file
+    user_id: int
+
+class SearchResult(BaseModel):
+    kind: Literal["post", "comment"]
+    # The post's or comment's id
+    id: int
+    post_id: int
+    body: Optional[str] = None
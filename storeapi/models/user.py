@@ -16,4 +16,8 @@ class UserLogin(BaseModel):
     password: str
 
 class UserWithTimestamp(User):
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+class Follow(BaseModel):
+    follower_id: int
+    followee_id: int
@@ -0,0 +1,45 @@
+import base64
+import binascii
+import json
+import logging
+from typing import Any, Optional
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def invalid_cursor_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST, detail="invalid pagination cursor"
+    )
+
+
+def cursor_headers(cursor: Optional[str]) -> dict[str, str]:
+    return {NEXT_CURSOR_HEADER: cursor} if cursor else {}
+
+
+def encode_cursor(sorting: str, key: list[Any]) -> str:
+    # The cursor is opaque to clients: it carries the sort key of the last row
+    # of a page so the next page can start with a range scan after it.
+    raw = json.dumps({"s": sorting, "k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sorting: str) -> list[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError) as e:
+        logger.debug(f"could not decode cursor {cursor!r}")
+        raise invalid_cursor_exception() from e
+    if not isinstance(data, dict) or not isinstance(data.get("k"), list):
+        raise invalid_cursor_exception()
+    # A cursor is only meaningful for the ordering that produced it.
+    if data.get("s") != sorting:
+        raise invalid_cursor_exception()
+    return data["k"]
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from databases.backends.postgres import PostgresBackend, PostgresConnection
+
+from storeapi import metrics
+from storeapi.database import PoolTimeout
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedPostgresBackend(PostgresBackend):
+    # databases' asyncpg backend, plus a bound on how long a query waits for
+    # a pooled connection and metrics for sizing the pool: connections in
+    # use and idle, queries waiting, and how long they waited. Metrics are
+    # named after the pool (db_pool.primary, db_pool.replica_0, ...).
+    def __init__(
+        self,
+        database_url,
+        *,
+        acquire_timeout: Optional[float] = None,
+        pool_name: str = "primary",
+        **options,
+    ):
+        super().__init__(database_url, **options)
+        self.acquire_timeout = acquire_timeout
+        prefix = f"db_pool.{pool_name}"
+        self.acquires = metrics.counter(f"{prefix}.acquires")
+        self.acquire_wait = metrics.counter(f"{prefix}.acquire_wait_seconds")
+        self.acquire_timeouts = metrics.counter(f"{prefix}.acquire_timeouts")
+        self.waiting = metrics.gauge(f"{prefix}.waiting")
+        metrics.register_collector(prefix, self.stats)
+
+    def connection(self) -> "InstrumentedPostgresConnection":
+        return InstrumentedPostgresConnection(self, self._dialect)
+
+    def stats(self) -> dict[str, float]:
+        stats = {
+            "mean_acquire_wait_seconds": self.acquire_wait.value / max(self.acquires.value, 1),
+        }
+        if self._pool is not None:
+            size = self._pool.get_size()
+            idle = self._pool.get_idle_size()
+            stats.update(
+                size=size, max_size=self._pool.get_max_size(), idle=idle, in_use=size - idle
+            )
+        return stats
+
+
+class InstrumentedPostgresConnection(PostgresConnection):
+    async def acquire(self) -> None:
+        assert self._connection is None, "Connection is already acquired"
+        assert self._database._pool is not None, "DatabaseBackend is not running"
+        backend = self._database
+        backend.waiting.inc()
+        start = time.perf_counter()
+        try:
+            self._connection = await backend._pool.acquire(timeout=backend.acquire_timeout)
+        except asyncio.TimeoutError as e:
+            backend.acquire_timeouts.inc()
+            logger.warning(f"no database connection free after {backend.acquire_timeout}s")
+            raise PoolTimeout() from e
+        finally:
+            backend.waiting.dec()
+            backend.acquires.inc()
+            backend.acquire_wait.inc(time.perf_counter() - start)
@@ -0,0 +1,80 @@
+import logging
+import random
+from typing import Annotated, Optional
+
+import databases
+from fastapi import Depends, Header, HTTPException
+
+from storeapi import metrics
+from storeapi.cache import Cache
+from storeapi.config import config
+from storeapi.database import Database, database, pool_options
+from storeapi.models.user import User
+from storeapi.security import get_current_user, get_subject_for_token_type
+
+logger = logging.getLogger(__name__)
+
+# Read-only handlers query a random replica. Users who wrote within
+# READ_YOUR_WRITES_SECONDS read from the primary instead, so they see their
+# own changes however far the replicas lag.
+replicas = [
+    Database(url, **pool_options(url, name=f"replica_{i}"))
+    for i, url in enumerate(config.DATABASE_REPLICA_URLS)
+]
+# Token subjects (emails) of recent writers. Shared between workers when
+# CACHE_URL is, so the next read can land on any worker.
+recent_writers = Cache("recent_writers", ttl=config.READ_YOUR_WRITES_SECONDS)
+replica_reads = metrics.counter("replicas.reads")
+primary_reads = metrics.counter("replicas.primary_reads")
+
+
+async def connect() -> None:
+    for replica in replicas:
+        await replica.connect()
+
+
+async def disconnect() -> None:
+    for replica in replicas:
+        await replica.disconnect()
+
+
+async def get_current_writer(
+    current_user: Annotated[User, Depends(get_current_user)],
+) -> User:
+    # get_current_user for handlers that write. Marked before the write, so
+    # the window covers the whole request.
+    if replicas:
+        await recent_writers.set(current_user.email, True)
+    return current_user
+
+
+def bearer_subject(authorization: Optional[str]) -> Optional[str]:
+    # Read endpoints are public: a missing or bad token just means anonymous
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return get_subject_for_token_type(token, "access")
+    except HTTPException:
+        return None
+
+
+async def read_database(
+    authorization: Annotated[Optional[str], Header()] = None,
+) -> databases.Database:
+    if not replicas:
+        return database
+    subject = bearer_subject(authorization)
+    if subject and await recent_writers.get(subject):
+        primary_reads.inc()
+        return database
+    replica_reads.inc()
+    return random.choice(replicas)
+
+
+def reads_own_writes(db: databases.Database) -> bool:
+    # True when read_database() picked the primary for a recent writer
+    return bool(replicas) and db is database
+
+
+ReadDatabase = Annotated[databases.Database, Depends(read_database)]
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import AsyncIterator
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from storeapi import events
+from storeapi.config import config
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Sent first: how long EventSource waits before reconnecting, in ms
+RETRY_FRAME = b"retry: 3000\n\n"
+HEARTBEAT_FRAME = b": ping\n\n"
+
+
+async def event_stream(heartbeat: float) -> AsyncIterator[bytes]:
+    # Subscribes only once the response starts streaming, so a client that
+    # disconnects before then never leaves a subscriber behind
+    subscriber = events.hub.subscribe()
+    try:
+        yield RETRY_FRAME
+        while not subscriber.closed:
+            try:
+                frame = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle connection
+                frame = HEARTBEAT_FRAME
+            if frame is None or subscriber.closed:
+                break
+            yield frame
+    finally:
+        events.hub.unsubscribe(subscriber)
+
+
+@router.get("/events")
+async def stream_events():
+    if events.hub.full:
+        raise HTTPException(
+            status_code=503,
+            detail="too many event streams",
+            headers={"Retry-After": "5"},
+        )
+    return StreamingResponse(
+        event_stream(config.EVENTS_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from storeapi import security
+
+router = APIRouter()
+
+
+@router.get("/.well-known/jwks.json")
+async def get_jwks():
+    # Public keys that verify this app's tokens, for services that check
+    # them without calling the app. Empty with an HMAC ALGORITHM.
+    return JSONResponse(
+        security.key_set.jwks(),
+        headers={"Cache-Control": "public, max-age=300"},
+    )
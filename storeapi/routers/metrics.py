@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+
+from storeapi import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
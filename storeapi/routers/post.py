@@ -1,46 +1,91 @@
 import logging
 from enum import Enum
-from typing import Annotated
+from typing import Annotated, Optional
 
+import databases
 import sqlalchemy
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
 
-from storeapi.database import comment_table, database, like_table, post_table, user_table
+from storeapi.cache import ResponseCache
+from storeapi.config import config
+from storeapi import events, likes, timeline
+from storeapi.database import (
+    comment_table,
+    database,
+    like_table,
+    post_table,
+    supports_returning,
+    user_table,
+)
+from storeapi.etags import etag_matches, make_etag, not_modified
+from storeapi.hot import hot_ranker, initial_hot_score
 from storeapi.models.post import (
+    BatchItemResult,
     Comment,
     CommentIn,
     PostLike,
     PostLikeIn,
+    PostsDeleted,
     UserPost,
+    UserPostCreate,
     UserPostIn,
     UserPostWithComments,
-    UserPostWithLikes,
+    UserPostWithExtras,
 )
 from storeapi.models.user import User
-from storeapi.security import get_current_user
+from storeapi.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    cursor_headers,
+    decode_cursor,
+    encode_cursor,
+    invalid_cursor_exception,
+)
+from storeapi.replicas import ReadDatabase, get_current_writer, reads_own_writes
+from storeapi.security import get_current_user, optional_oauth2_scheme
+from storeapi.serialization import dump_rows, json_response
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
+# The public feed is the same for every caller, so rendered pages are shared
+feed_cache = ResponseCache(
+    "feed", ttl=config.FEED_CACHE_TTL_SECONDS, maxsize=config.FEED_CACHE_MAX_SIZE
+)
+
 select_post_and_likes = (
     sqlalchemy.select(
         post_table.c.id,
         post_table.c.body,
         post_table.c.user_id,
         post_table.c.image_url,
+        post_table.c.image_variants,
         post_table.c.created_at,
-        sqlalchemy.func.count(like_table.c.id).label("likes"),
+        post_table.c.like_count.label("likes"),
         sqlalchemy.func.coalesce(user_table.c.username, "Unknown").label("username"),
+        post_table.c.version,
+        post_table.c.hot_score,
     )
     .select_from(
-        post_table
-        .outerjoin(like_table, post_table.c.id == like_table.c.post_id)
-        .outerjoin(user_table, post_table.c.user_id == user_table.c.id)
+        post_table.outerjoin(user_table, post_table.c.user_id == user_table.c.id)
     )
-    .group_by(post_table.c.id, user_table.c.username)
 )
 
+# Just enough of each post to paginate and build the page's ETag
+select_post_keys = sqlalchemy.select(
+    post_table.c.id,
+    post_table.c.version,
+    post_table.c.like_count.label("likes"),
+    post_table.c.hot_score,
+)
+
+IfNoneMatch = Annotated[Optional[str], Header()]
+
+MAX_BATCH_SIZE = 1000
+# Rows per INSERT statement, well under SQLite's bound parameter limit
+INSERT_CHUNK_SIZE = 500
+
 async def find_post(post_id: int):
     logger.info(f"finding post with id {post_id}")
     query = post_table.select().where(post_table.c.id == post_id)
@@ -49,153 +94,596 @@ async def find_post(post_id: int):
 
 @router.post("/post", response_model=UserPost, status_code=201)
 async def create_post(
-    post: UserPostIn, current_user: Annotated[User, Depends(get_current_user)]
+    post: UserPostCreate, current_user: Annotated[User, Depends(get_current_writer)]
 ):
     logger.info("creating post")
-    data = {**post.model_dump(), "user_id": current_user.id}
+    data = {**post.model_dump(), "user_id": current_user.id, "hot_score": initial_hot_score()}
     query = post_table.insert().values(data)
-    last_record_id = await database.execute(query)
-    
-    # Fetch the created post to get all fields including created_at
-    created_post = await find_post(last_record_id)
+    async with database.transaction():
+        if supports_returning():
+            created_post = await database.fetch_one(query.returning(*post_table.c))
+        else:
+            # Fetch the created post to get all fields including created_at
+            last_record_id = await database.execute(query)
+            created_post = await find_post(last_record_id)
+        await timeline.fan_out(current_user.id, [created_post["id"]])
+    await feed_cache.invalidate()
+    await events.publish("post_created", UserPost.model_validate(created_post).model_dump())
     return created_post
 
+async def insert_many(table: sqlalchemy.Table, rows: list[dict]) -> list:
+    # Inserts `rows` a chunk per statement and returns the created rows in
+    # the same order. Call it inside a transaction.
+    created = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start : start + INSERT_CHUNK_SIZE]
+        if supports_returning():
+            inserted = await database.fetch_all(
+                table.insert().values(chunk).returning(*table.c)
+            )
+        else:
+            await database.execute_many(table.insert(), chunk)
+            # SQLite has one writer at a time, so the newest rows are ours
+            inserted = await database.fetch_all(
+                table.select().order_by(table.c.id.desc()).limit(len(chunk))
+            )
+        # Ids are handed out in row order, whatever order RETURNING lists them in
+        created += sorted(inserted, key=lambda row: row["id"])
+    return created
+
+@router.post("/post/batch", response_model=list[BatchItemResult])
+async def create_posts(
+    posts: Annotated[list[UserPostCreate], Body(min_length=1, max_length=MAX_BATCH_SIZE)],
+    current_user: Annotated[User, Depends(get_current_writer)],
+):
+    logger.info(f"creating {len(posts)} posts")
+    hot_score = initial_hot_score()
+    rows = [
+        {**post.model_dump(), "user_id": current_user.id, "hot_score": hot_score}
+        for post in posts
+    ]
+    async with database.transaction():
+        created_posts = await insert_many(post_table, rows)
+        await timeline.fan_out(current_user.id, [row["id"] for row in created_posts])
+    await feed_cache.invalidate()
+    for created_post in created_posts:
+        await events.publish("post_created", UserPost.model_validate(created_post).model_dump())
+    return [{"id": created_post["id"]} for created_post in created_posts]
+
 class PostSorting(str, Enum):
     new = "new"
     old = "old"
     most_likes = "most_likes"
+    # Likes and comments, decayed by age; see storeapi/hot.py
+    hot = "hot"
 
-@router.get("/post", response_model=list[UserPostWithLikes])
-async def get_all_post(sorting: PostSorting = PostSorting.new):
-    logger.info("getting all the post")
+PageLimit = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
 
+def cursor_key(after: str, sorting: PostSorting) -> list:
+    key = decode_cursor(after, sorting.value)
+    if sorting == PostSorting.hot:
+        # (hot_score, id); a whole-valued score may come back as an int
+        valid = len(key) == 2 and type(key[0]) in (int, float) and type(key[1]) is int
+    else:
+        expected_length = 2 if sorting == PostSorting.most_likes else 1
+        valid = len(key) == expected_length and all(type(value) is int for value in key)
+    if not valid:
+        raise invalid_cursor_exception()
+    return key
+
+def paginate_posts(query, sorting: PostSorting, limit: int, after: Optional[str]):
+    # Keyset pagination: every ordering ends in post id so the sort key is
+    # unique, and the next page starts strictly after the last row seen.
+    key = cursor_key(after, sorting) if after else None
     if sorting == PostSorting.new:
-        query = select_post_and_likes.order_by(post_table.c.id.desc())
+        query = query.order_by(post_table.c.id.desc())
+        if key:
+            query = query.where(post_table.c.id < key[0])
     elif sorting == PostSorting.old:
-        query = select_post_and_likes.order_by(post_table.c.id.asc())
+        query = query.order_by(post_table.c.id.asc())
+        if key:
+            query = query.where(post_table.c.id > key[0])
     elif sorting == PostSorting.most_likes:
-        query = select_post_and_likes.order_by(sqlalchemy.desc("likes"))
+        like_count = post_table.c.like_count
+        query = query.order_by(like_count.desc(), post_table.c.id.desc())
+        if key:
+            query = query.where(
+                sqlalchemy.or_(
+                    like_count < key[0],
+                    sqlalchemy.and_(like_count == key[0], post_table.c.id < key[1]),
+                )
+            )
+    elif sorting == PostSorting.hot:
+        hot_score = post_table.c.hot_score
+        query = query.order_by(hot_score.desc(), post_table.c.id.desc())
+        if key:
+            query = query.where(
+                sqlalchemy.or_(
+                    hot_score < key[0],
+                    sqlalchemy.and_(hot_score == key[0], post_table.c.id < key[1]),
+                )
+            )
+    # One extra row tells us whether there is a next page.
+    return query.limit(limit + 1)
+
+def next_cursor(rows: list, sorting: PostSorting) -> str:
+    last = rows[-1]
+    if sorting == PostSorting.most_likes:
+        return encode_cursor(sorting.value, [last.likes, last.id])
+    if sorting == PostSorting.hot:
+        return encode_cursor(sorting.value, [last.hot_score, last.id])
+    return encode_cursor(sorting.value, [last.id])
 
+async def fetch_post_page(
+    db: databases.Database, query, sorting: PostSorting, limit: int, after: Optional[str]
+):
+    query = paginate_posts(query, sorting, limit, after)
     logger.debug(query)
-    return await database.fetch_all(query)
+    rows = await db.fetch_all(query)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, next_cursor(rows, sorting)
+    return rows, None
+
+def post_page_etag(rows: list, cursor: Optional[str], variant: tuple = ()) -> str:
+    # Changes when any post on the page changes or the page holds other
+    # posts. Likes and comments bump a post's version, so the ETag also
+    # covers comment_count and liked_by_me; `variant` tells apart the
+    # representations ?include= asks for.
+    return make_etag(*variant, cursor, *(f"{row.id}.{row.version}" for row in rows))
+
+async def page_not_modified(
+    db: databases.Database,
+    keys_query,
+    sorting: PostSorting,
+    limit: int,
+    after: Optional[str],
+    if_none_match: str,
+    variant: tuple = (),
+) -> Optional[Response]:
+    rows, cursor = await fetch_post_page(db, keys_query, sorting, limit, after)
+    etag = post_page_etag(rows, cursor, variant)
+    return not_modified(etag) if etag_matches(if_none_match, etag) else None
+
+class FeedExtra(str, Enum):
+    comment_count = "comment_count"
+    # False for anonymous requests
+    liked_by_me = "liked_by_me"
+
+FEED_EXTRAS = frozenset(extra.value for extra in FeedExtra)
+FeedInclude = Annotated[list[FeedExtra], Query()]
+OptionalToken = Annotated[Optional[str], Depends(optional_oauth2_scheme)]
+
+def with_extras(query, include: list[FeedExtra], viewer: Optional[User]):
+    # Each extra is a subquery per post on the page, answered from the
+    # comments (post_id, id) and likes (post_id, user_id) indexes, so the
+    # page still comes back in one query
+    if FeedExtra.comment_count in include:
+        comment_count = (
+            sqlalchemy.select(sqlalchemy.func.count(comment_table.c.id))
+            .where(comment_table.c.post_id == post_table.c.id)
+            .scalar_subquery()
+        )
+        query = query.add_columns(comment_count.label("comment_count"))
+    if FeedExtra.liked_by_me in include:
+        liked_by_me = (
+            sqlalchemy.exists().where(
+                like_table.c.post_id == post_table.c.id, like_table.c.user_id == viewer.id
+            )
+            if viewer
+            else sqlalchemy.false()
+        )
+        query = query.add_columns(liked_by_me.label("liked_by_me"))
+    return query
+
+async def feed_viewer(
+    include: list[FeedExtra], token: Optional[str]
+) -> tuple[list[FeedExtra], Optional[User]]:
+    # The user liked_by_me is about, only looked up when it's asked for. The
+    # feed is public, so a bad or expired token doesn't fail the request: the
+    # feed comes back without liked_by_me.
+    if FeedExtra.liked_by_me not in include or not token:
+        return include, None
+    try:
+        return include, await get_current_user(token)
+    except HTTPException:
+        return [extra for extra in include if extra != FeedExtra.liked_by_me], None
+
+def feed_variant(include: list[FeedExtra], viewer: Optional[User]) -> tuple:
+    variant = tuple(sorted({extra.value for extra in include}))
+    return (*variant, f"user:{viewer.id}") if viewer else variant
+
+def dump_feed(rows: list, include: list[FeedExtra]) -> bytes:
+    return dump_rows(
+        rows, UserPostWithExtras, FEED_EXTRAS - {extra.value for extra in include}
+    )
+
+@router.get("/post", response_model=list[UserPostWithExtras])
+async def get_all_post(
+    db: ReadDatabase,
+    sorting: PostSorting = PostSorting.new,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    if_none_match: IfNoneMatch = None,
+    include: FeedInclude = [],
+    token: OptionalToken = None,
+):
+    logger.info("getting all the post")
+    include, viewer = await feed_viewer(include, token)
+    variant = feed_variant(include, viewer)
+    key = ":".join((sorting.value, str(limit), after or "", *variant))
+    generation = await feed_cache.generation()
+    # Pages with a user's likes are theirs alone, and aren't cached
+    use_cache = viewer is None
+    cached = None
+    # A page cached from a lagging replica may predate the user's own write
+    if use_cache and not reads_own_writes(db):
+        cached = await feed_cache.get_response(generation, key)
+    if cached:
+        etag = cached.headers.get("ETag")
+        if etag and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        return json_response(cached.body, {**cached.headers, "X-Cache": "HIT"})
+    if if_none_match:
+        unchanged = await page_not_modified(
+            db, select_post_keys, sorting, limit, after, if_none_match, variant
+        )
+        if unchanged:
+            return unchanged
+
+    query = with_extras(select_post_and_likes, include, viewer)
+    rows, cursor = await fetch_post_page(db, query, sorting, limit, after)
+    body = dump_feed(rows, include)
+    headers = {**cursor_headers(cursor), "ETag": post_page_etag(rows, cursor, variant)}
+    if not use_cache:
+        return json_response(body, headers)
+    await feed_cache.set_response(generation, key, body, headers)
+    return json_response(body, {**headers, "X-Cache": "MISS"})
 
 @router.post("/comment", response_model=Comment, status_code=201)
 async def create_comment(
-    comment: CommentIn, current_user: Annotated[User, Depends(get_current_user)]
+    comment: CommentIn, current_user: Annotated[User, Depends(get_current_writer)]
 ):
     logger.info("creating comments")
-    post = await find_post(comment.post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="post not found")
-    
     data = {**comment.model_dump(), "user_id": current_user.id}
     query = comment_table.insert().values(data)
-    last_record_id = await database.execute(query)
+    bump_version = (
+        post_table.update()
+        .where(post_table.c.id == comment.post_id)
+        .values(version=post_table.c.version + 1)
+    )
+    async with database.transaction():
+        if supports_returning():
+            # Bumping the post's version also tells us whether it exists
+            if await database.fetch_val(bump_version.returning(post_table.c.id)) is None:
+                raise HTTPException(status_code=404, detail="post not found")
+            row = await database.fetch_one(query.returning(*comment_table.c))
+        else:
+            if not await find_post(comment.post_id):
+                raise HTTPException(status_code=404, detail="post not found")
+            last_record_id = await database.execute(query)
+            await database.execute(bump_version)
+            row = await database.fetch_one(
+                comment_table.select().where(comment_table.c.id == last_record_id)
+            )
+    # Feed ETags include the post's version, so cached pages are out of date
+    await feed_cache.invalidate()
+    hot_ranker.mark(comment.post_id)
     
-    # Fetch the created comment to get all fields including created_at and username
-    comment_query = (
-        sqlalchemy.select(comment_table, user_table.c.username)
-        .select_from(comment_table.join(user_table))
-        .where(comment_table.c.id == last_record_id)
+    created_comment = {**row, "username": current_user.username}
+    await events.publish(
+        "comment_created", Comment.model_validate(created_comment).model_dump()
     )
-    created_comment = await database.fetch_one(comment_query)
     
     return created_comment
 
+# Each post gets one version bump per batch, however many comments it gained
+BUMP_POST_VERSION = "UPDATE posts SET version = version + 1 WHERE id = :post_id"
+
+@router.post("/comment/batch", response_model=list[BatchItemResult])
+async def create_comments(
+    comments: Annotated[list[CommentIn], Body(min_length=1, max_length=MAX_BATCH_SIZE)],
+    current_user: Annotated[User, Depends(get_current_writer)],
+):
+    logger.info(f"creating {len(comments)} comments")
+    post_ids = {comment.post_id for comment in comments}
+    results = [{"error": "post not found"} for _ in comments]
+    async with database.transaction():
+        existing_posts = {
+            row["id"]
+            for row in await database.fetch_all(
+                sqlalchemy.select(post_table.c.id).where(post_table.c.id.in_(post_ids))
+            )
+        }
+        valid = [
+            (index, {**comment.model_dump(), "user_id": current_user.id})
+            for index, comment in enumerate(comments)
+            if comment.post_id in existing_posts
+        ]
+        created_comments = await insert_many(comment_table, [row for _, row in valid])
+        commented_posts = {row["post_id"] for _, row in valid}
+        if commented_posts:
+            await database.execute_many(
+                BUMP_POST_VERSION, [{"post_id": post_id} for post_id in commented_posts]
+            )
+    if valid:
+        await feed_cache.invalidate()
+    for post_id in commented_posts:
+        hot_ranker.mark(post_id)
+    for (index, _), row in zip(valid, created_comments):
+        results[index] = {"id": row["id"]}
+        created_comment = {**row, "username": current_user.username}
+        await events.publish(
+            "comment_created", Comment.model_validate(created_comment).model_dump()
+        )
+    return results
+
+COMMENTS_CURSOR = "comments"
+
+select_comments = sqlalchemy.select(comment_table, user_table.c.username).select_from(
+    comment_table.join(user_table)
+)
+
+def comments_after(after: Optional[str]) -> int:
+    key = decode_cursor(after, COMMENTS_CURSOR)
+    if len(key) != 1 or type(key[0]) is not int:
+        raise invalid_cursor_exception()
+    return key[0]
+
 @router.get("/post/{post_id}/comment", response_model=list[Comment])
-async def get_all_comment_on_post(post_id: int):
+async def get_all_comment_on_post(
+    post_id: int,
+    db: ReadDatabase,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+):
     logger.info("Getting comments on post")
     query = (
-        sqlalchemy.select(comment_table, user_table.c.username)
+        select_comments.where(comment_table.c.post_id == post_id)
+        .order_by(comment_table.c.id)
+        .limit(limit + 1)
+    )
+    if after:
+        query = query.where(comment_table.c.id > comments_after(after))
+    logger.debug(query)
+    comments = await db.fetch_all(query)
+    cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        cursor = encode_cursor(COMMENTS_CURSOR, [comments[-1].id])
+    return json_response(dump_rows(comments, Comment), cursor_headers(cursor))
+
+def select_post_with_comments(post_id: int, comments_limit: int):
+    # The post, its comment count and the first page of its comments in one
+    # round trip: one row per comment, or a single row with null comment
+    # columns when there are none.
+    comments_page = (
+        sqlalchemy.select(
+            comment_table.c.id.label("comment_id"),
+            comment_table.c.body.label("comment_body"),
+            comment_table.c.user_id.label("comment_user_id"),
+            comment_table.c.created_at.label("comment_created_at"),
+            user_table.c.username.label("comment_username"),
+        )
         .select_from(comment_table.join(user_table))
         .where(comment_table.c.post_id == post_id)
+        .order_by(comment_table.c.id)
+        .limit(comments_limit + 1)
+        .subquery("comments_page")
     )
-    logger.debug(query)
-    return await database.fetch_all(query)
+    # Not correlated with posts, so it is evaluated once rather than per row
+    comment_count = (
+        sqlalchemy.select(sqlalchemy.func.count(comment_table.c.id))
+        .where(comment_table.c.post_id == post_id)
+        .scalar_subquery()
+    )
+    return (
+        select_post_and_likes.add_columns(
+            comment_count.label("comment_count"), *comments_page.c
+        )
+        .outerjoin(comments_page, sqlalchemy.true())
+        .where(post_table.c.id == post_id)
+        .order_by(comments_page.c.comment_id)
+    )
+
+def post_etag(post_id: int, version: int, comments_limit: int) -> str:
+    return make_etag(post_id, version, comments_limit)
 
 @router.get("/post/{post_id}", response_model=UserPostWithComments)
-async def get_post_with_comments(post_id: int):
+async def get_post_with_comments(
+    post_id: int,
+    response: Response,
+    db: ReadDatabase,
+    comments_limit: Annotated[int, Query(ge=0, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    if_none_match: IfNoneMatch = None,
+):
     logger.info("Getting post and its comments")
-    query = select_post_and_likes.where(post_table.c.id == post_id)
+    if if_none_match:
+        version = await db.fetch_val(
+            sqlalchemy.select(post_table.c.version).where(post_table.c.id == post_id)
+        )
+        if version is not None:
+            etag = post_etag(post_id, version, comments_limit)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+
+    query = select_post_with_comments(post_id, comments_limit)
     logger.debug(query)
-    post = await database.fetch_one(query)
-    if not post:
+    rows = await db.fetch_all(query)
+    if not rows:
         raise HTTPException(status_code=404, detail="post not found")
+    comments = [
+        {
+            "id": row.comment_id,
+            "body": row.comment_body,
+            "post_id": post_id,
+            "user_id": row.comment_user_id,
+            "username": row.comment_username,
+            "created_at": row.comment_created_at,
+        }
+        for row in rows
+        if row.comment_id is not None
+    ]
+    next_comments_cursor = None
+    if len(comments) > comments_limit:
+        comments = comments[:comments_limit]
+        last_id = comments[-1]["id"] if comments else 0
+        next_comments_cursor = encode_cursor(COMMENTS_CURSOR, [last_id])
+    response.headers["ETag"] = post_etag(post_id, rows[0].version, comments_limit)
     return {
-        "post": post,
-        "comments": await get_all_comment_on_post(post_id),
+        "post": rows[0],
+        "comments": comments,
+        "comment_count": rows[0].comment_count,
+        "next_comments_cursor": next_comments_cursor,
     }
 
 @router.post("/like", response_model=PostLike, status_code=201)
 async def like_post(
-    like: PostLikeIn, current_user: Annotated[User, Depends(get_current_user)]
+    like: PostLikeIn,
+    response: Response,
+    current_user: Annotated[User, Depends(get_current_writer)],
 ):
     logger.info("liking post")
-    post = await find_post(like.post_id)
-    if not post:
+    result = await likes.like(like.post_id, current_user.id)
+    if result is None:
         raise HTTPException(status_code=404, detail="post not found")
     data = {**like.model_dump(), "user_id": current_user.id}
-    query = like_table.insert().values(data)
-    logger.debug(query)
-    last_record_id = await database.execute(query)
-    return {**data, "id": last_record_id}
+    if not result.created:
+        # Liking again changes nothing and returns the existing like
+        response.status_code = 200
+        return {**data, "id": result.like_id}
+    await feed_cache.invalidate()
+    hot_ranker.mark(like.post_id)
+    await events.publish("post_liked", data)
+    return {**data, "id": result.like_id}
+
+@router.delete("/like/{post_id}", status_code=204)
+async def unlike_post(
+    post_id: int, current_user: Annotated[User, Depends(get_current_writer)]
+):
+    logger.info(f"unliking post {post_id}")
+    # Unliking a post that isn't liked is a no-op
+    if await likes.unlike(post_id, current_user.id):
+        await feed_cache.invalidate()
+        hot_ranker.mark(post_id)
+        await events.publish("post_unliked", {"post_id": post_id, "user_id": current_user.id})
+    return None
+
+async def delete_own_posts(user_id: int, *conditions) -> list[int]:
+    # Deletes the user's posts matching `conditions` and returns their ids.
+    # Comments and likes go with them through ON DELETE CASCADE.
+    where = (post_table.c.user_id == user_id, *conditions)
+    async with database.transaction():
+        if supports_returning():
+            rows = await database.fetch_all(
+                post_table.delete().where(*where).returning(post_table.c.id)
+            )
+        else:
+            rows = await database.fetch_all(sqlalchemy.select(post_table.c.id).where(*where))
+            await database.execute(post_table.delete().where(*where))
+    return sorted(row["id"] for row in rows)
+
+async def missing_or_forbidden(post_id: int, action: str) -> HTTPException:
+    # Only writes that matched nothing pay for finding out why
+    if not await find_post(post_id):
+        return HTTPException(status_code=404, detail="post not found")
+    return HTTPException(status_code=403, detail=f"not authorized to {action} this post")
 
 @router.delete("/post/{post_id}", status_code=204)
 async def delete_post(
-    post_id: int, current_user: Annotated[User, Depends(get_current_user)]
+    post_id: int, current_user: Annotated[User, Depends(get_current_writer)]
 ):
     logger.info(f"deleting post {post_id}")
-    post = await find_post(post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="post not found")
-    
-    # Check if user owns the post
-    if post.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="not authorized to delete this post")
-    
-    # Delete likes first (foreign key constraint)
-    delete_likes = like_table.delete().where(like_table.c.post_id == post_id)
-    await database.execute(delete_likes)
-    
-    # Delete comments
-    delete_comments = comment_table.delete().where(comment_table.c.post_id == post_id)
-    await database.execute(delete_comments)
-    
-    # Delete post
-    query = post_table.delete().where(post_table.c.id == post_id)
-    await database.execute(query)
+    # The ownership check is part of the delete
+    if not await delete_own_posts(current_user.id, post_table.c.id == post_id):
+        raise await missing_or_forbidden(post_id, "delete")
+    await feed_cache.invalidate()
+    await events.publish("post_deleted", {"id": post_id})
     return None
 
+@router.delete("/post", response_model=PostsDeleted)
+async def delete_posts(
+    current_user: Annotated[User, Depends(get_current_writer)],
+    ids: Annotated[list[int], Query(min_length=1, max_length=MAX_PAGE_SIZE)],
+):
+    logger.info(f"deleting {len(ids)} posts")
+    deleted = await delete_own_posts(current_user.id, post_table.c.id.in_(ids))
+    if deleted:
+        await feed_cache.invalidate()
+    for post_id in deleted:
+        await events.publish("post_deleted", {"id": post_id})
+    return {"deleted": deleted}
+
 @router.put("/post/{post_id}", response_model=UserPost)
 async def update_post(
     post_id: int,
     post_update: UserPostIn,
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[User, Depends(get_current_writer)],
 ):
     logger.info(f"updating post {post_id}")
-    post = await find_post(post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="post not found")
-    
-    # Check if user owns the post
-    if post.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="not authorized to edit this post")
-    
+    # The ownership check is part of the update
+    where = (post_table.c.id == post_id, post_table.c.user_id == current_user.id)
     query = (
         post_table.update()
-        .where(post_table.c.id == post_id)
-        .values(body=post_update.body)
+        .where(*where)
+        .values(body=post_update.body, version=post_table.c.version + 1)
     )
-    await database.execute(query)
-    
-    # Return updated post
-    updated_post = await find_post(post_id)
+    if supports_returning():
+        updated_post = await database.fetch_one(query.returning(*post_table.c))
+    else:
+        updated_post = None
+        async with database.transaction():
+            if await database.fetch_val(sqlalchemy.select(post_table.c.id).where(*where)):
+                await database.execute(query)
+                updated_post = await find_post(post_id)
+    if updated_post is None:
+        raise await missing_or_forbidden(post_id, "edit")
+    await feed_cache.invalidate()
+    await events.publish("post_updated", UserPost.model_validate(updated_post).model_dump())
     return updated_post
 
-@router.get("/user/{user_id}/posts", response_model=list[UserPostWithLikes])
-async def get_user_posts(user_id: int):
+@router.get("/user/{user_id}/posts", response_model=list[UserPostWithExtras])
+async def get_user_posts(
+    user_id: int,
+    db: ReadDatabase,
+    sorting: PostSorting = PostSorting.new,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    if_none_match: IfNoneMatch = None,
+    include: FeedInclude = [],
+    token: OptionalToken = None,
+):
     logger.info(f"getting posts for user {user_id}")
-    query = select_post_and_likes.where(post_table.c.user_id == user_id).order_by(
-        post_table.c.id.desc()
+    include, viewer = await feed_viewer(include, token)
+    variant = feed_variant(include, viewer)
+    if if_none_match:
+        keys_query = select_post_keys.where(post_table.c.user_id == user_id)
+        unchanged = await page_not_modified(
+            db, keys_query, sorting, limit, after, if_none_match, variant
+        )
+        if unchanged:
+            return unchanged
+
+    query = with_extras(select_post_and_likes, include, viewer).where(
+        post_table.c.user_id == user_id
+    )
+    rows, cursor = await fetch_post_page(db, query, sorting, limit, after)
+    headers = {**cursor_headers(cursor), "ETag": post_page_etag(rows, cursor, variant)}
+    return json_response(dump_feed(rows, include), headers)
+
+@router.get("/timeline", response_model=list[UserPostWithExtras])
+async def get_home_timeline(
+    db: ReadDatabase,
+    current_user: Annotated[User, Depends(get_current_user)],
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    include: FeedInclude = [],
+):
+    logger.info(f"getting the home timeline of user {current_user.id}")
+    before = cursor_key(after, PostSorting.new)[0] if after else None
+    post_ids = await timeline.home_timeline_post_ids(db, current_user.id, limit, before)
+    query = with_extras(select_post_and_likes, include, current_user).where(
+        post_table.c.id.in_(post_ids)
     )
-    return await database.fetch_all(query)
\ No newline at end of file
+    rows, cursor = await fetch_post_page(db, query, PostSorting.new, limit, after)
+    return json_response(dump_feed(rows, include), cursor_headers(cursor))
@@ -0,0 +1,100 @@
+import logging
+import re
+from typing import Annotated, Optional
+
+import databases
+from fastapi import APIRouter, Query
+
+from storeapi.models.post import SearchResult
+from storeapi.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    cursor_headers,
+    decode_cursor,
+    encode_cursor,
+    invalid_cursor_exception,
+)
+from storeapi.replicas import ReadDatabase
+from storeapi.serialization import dump_rows, json_response
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+SEARCH_CURSOR = "search"
+
+# search_documents is maintained by triggers, see migration 0008. Results
+# are ordered by score, lowest first, then by document id so the order is
+# total and a page can start strictly after the previous one's last row.
+SQLITE_SEARCH = """
+SELECT rowid AS document_id, kind, ref_id AS id, post_id, body,
+    bm25(search_documents) AS score
+FROM search_documents
+WHERE search_documents MATCH :query {after}
+ORDER BY score, document_id
+LIMIT :limit
+"""
+SQLITE_AFTER = (
+    "AND (bm25(search_documents) > :score "
+    "OR (bm25(search_documents) = :score AND rowid > :document_id))"
+)
+
+POSTGRES_SEARCH = """
+SELECT search_documents.id AS document_id, kind, ref_id AS id, post_id, body,
+    -ts_rank(document, query) AS score
+FROM search_documents, websearch_to_tsquery('english', :query) AS query
+WHERE document @@ query {after}
+ORDER BY score, document_id
+LIMIT :limit
+"""
+POSTGRES_AFTER = "AND (-ts_rank(document, query), search_documents.id) > (:score, :document_id)"
+
+
+def fts5_query(q: str) -> str:
+    # Each word becomes a quoted FTS5 string, so input can't use (or break
+    # on) the query syntax; a document must contain all of them
+    return " ".join(f'"{term}"' for term in re.findall(r"\w+", q))
+
+
+def search_after(after: str) -> list:
+    key = decode_cursor(after, SEARCH_CURSOR)
+    if (
+        len(key) != 2
+        or type(key[0]) not in (int, float)
+        or type(key[1]) is not int
+    ):
+        raise invalid_cursor_exception()
+    return key
+
+
+async def search_documents(
+    db: databases.Database, q: str, limit: int, after: Optional[str] = None
+) -> tuple[list, Optional[str]]:
+    if db.url.dialect == "sqlite":
+        query, after_clause, q = SQLITE_SEARCH, SQLITE_AFTER, fts5_query(q)
+        if not q:
+            return [], None
+    else:
+        query, after_clause = POSTGRES_SEARCH, POSTGRES_AFTER
+    values = {"query": q, "limit": limit + 1}
+    if after:
+        values["score"], values["document_id"] = search_after(after)
+    query = query.format(after=after_clause if after else "")
+    rows = await db.fetch_all(query, values)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor(SEARCH_CURSOR, [last["score"], last["document_id"]])
+    return rows, None
+
+
+@router.get("/search", response_model=list[SearchResult])
+async def search(
+    db: ReadDatabase,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+):
+    logger.info("searching posts and comments")
+    rows, cursor = await search_documents(db, q, limit, after)
+    return json_response(dump_rows(rows, SearchResult), cursor_headers(cursor))
@@ -1,30 +1,92 @@
+import asyncio
+import io
 import logging
-import tempfile
-import aiofiles
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor,ThreadPoolExecutor
+from functools import partial
+from typing import Annotated
 
-from fastapi import APIRouter,HTTPException,UploadFile,status
-from storeapi.libs.b2 import b2_upload_file
+from fastapi import APIRouter,Depends,HTTPException,UploadFile,status
+from PIL import Image,UnidentifiedImageError
+from storeapi.config import config
+from storeapi.libs.images import VARIANTS,render_variants,variant_file_name
+from storeapi.libs.storage import StorageBackend,StorageUnavailable,get_storage
+from storeapi.libs.streaming import stream_upload
 
 logger=logging.getLogger(__name__)
 
 router=APIRouter()
 
 CHUNKS_SIZE=1024*1024
+# Chunks read from the request but not yet taken by the uploading thread
+MAX_BUFFERED_CHUNKS=4
+
+upload_executor=ThreadPoolExecutor(
+    max_workers=config.UPLOAD_WORKERS,thread_name_prefix="upload"
+)
+# Workers start on first use. Spawned rather than forked, since the parent
+# runs database and upload threads.
+image_executor=ProcessPoolExecutor(
+    max_workers=config.IMAGE_WORKERS,mp_context=multiprocessing.get_context("spawn")
+)
+
+
+async def upload_variants(file:UploadFile,storage:StorageBackend)->dict[str,str]:
+    if not (file.content_type or "").startswith("image/"):
+        return {}
+    if file.size is None or file.size>config.IMAGE_MAX_BYTES:
+        logger.info(f"not creating variants of {file.filename}, it is too large")
+        return {}
+    # Starlette keeps the whole upload in its spooled file, so read it again
+    await file.seek(0)
+    data=await file.read()
+    loop=asyncio.get_running_loop()
+    try:
+        rendered=await loop.run_in_executor(image_executor,render_variants,data)
+    except (UnidentifiedImageError,Image.DecompressionBombError) as e:
+        logger.warning(f"could not create variants of {file.filename}: {e}")
+        return {}
+    urls=await asyncio.gather(*(
+        loop.run_in_executor(
+            upload_executor,
+            storage.upload_stream,
+            io.BytesIO(rendered[variant.name]),
+            variant_file_name(file.filename,variant),
+        )
+        for variant in VARIANTS
+    ))
+    return {variant.name:url for variant,url in zip(VARIANTS,urls)}
 
 
 @router.post("/upload",status_code=201)
-async def upload_file(file:UploadFile):
+async def upload_file(
+    file:UploadFile,storage:Annotated[StorageBackend,Depends(get_storage)]
+):
     try:
-        with tempfile.NamedTemporaryFile() as temp_file:
-            filename=temp_file.name
-            logger.info("saving uploader file temporarily to {filename}")
-            async with aiofiles.open(filename,"wb") as f:
-                while chunk:=await file.read(CHUNKS_SIZE):
-                    await f.write(chunk)
-            file_url=b2_upload_file(local_file=filename,file_name=file.filename)
+        logger.info(f"streaming upload of {file.filename}")
+        file_url=await stream_upload(
+            file,
+            partial(storage.upload_stream,file_name=file.filename),
+            upload_executor,
+            chunk_size=CHUNKS_SIZE,
+            max_buffered_chunks=MAX_BUFFERED_CHUNKS,
+        )
+        variants=await upload_variants(file,storage)
+    except StorageUnavailable as e:
+        logger.error(f"storage unavailable for {file.filename}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="file storage is unavailable, try again later",
+            headers={"Retry-After":"30"}
+        )
     except Exception:
+        logger.exception(f"uploading {file.filename} failed")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="there was an error uploading the file"
         )
-    return {"detail":f"successfully uploaded {file.filename}","file_url":file_url}
\ No newline at end of file
+    return {
+        "detail":f"successfully uploaded {file.filename}",
+        "file_url":file_url,
+        "variants":variants,
+    }
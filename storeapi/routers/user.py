@@ -1,19 +1,22 @@
 import logging
-from fastapi import APIRouter, HTTPException, status, Request, Depends
+from fastapi import APIRouter, HTTPException, status, Request, Depends, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from storeapi.models.user import UserIn
 from typing import Optional,Annotated
 from storeapi.security import (
     get_user,
-    get_password_hash,
+    hash_password,
     authenticate_user,
     create_access_token,
     create_confirmation_token,
     get_subject_for_token_type,
-    get_current_user
+    get_current_user,
+    invalidate_cached_user,
 )
+from storeapi import timeline
 from storeapi.database import database, user_table
-from storeapi.models.user import User
+from storeapi.models.user import Follow, User
+from storeapi.replicas import get_current_writer
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -36,7 +39,7 @@ async def register(user: UserIn, request: Request):
             detail="A user with that username already exists",
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     query = user_table.insert().values(
         email=user.email,
         username=user.username,
@@ -76,6 +79,7 @@ async def confirm_email(token: str):
     query = user_table.update().where(user_table.c.email == email).values(confirmed=True)
     logger.debug(query)
     await database.execute(query)
+    await invalidate_cached_user(email)
     return {"detail": "User confirmed"}
 
 
@@ -90,4 +94,33 @@ async def get_current_user_info(current_user: Annotated[User, Depends(get_curren
         "id": user_data.id,
         "email": user_data.email,
         "username": user_data.username,
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/user/{user_id}/follow", response_model=Follow, status_code=201)
+async def follow_user(
+    user_id: int,
+    response: Response,
+    current_user: Annotated[User, Depends(get_current_writer)],
+):
+    if user_id == current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="You can't follow yourself"
+        )
+    created = await timeline.follow(current_user.id, user_id)
+    if created is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="user not found")
+    if not created:
+        # Already following
+        response.status_code = status.HTTP_200_OK
+    return {"follower_id": current_user.id, "followee_id": user_id}
+
+
+@router.delete("/user/{user_id}/follow", status_code=204)
+async def unfollow_user(
+    user_id: int, current_user: Annotated[User, Depends(get_current_writer)]
+):
+    if not await timeline.unfollow(current_user.id, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="not following this user"
+        )
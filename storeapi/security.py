@@ -1,6 +1,9 @@
+import asyncio
 import logging
 import datetime
-from typing import Annotated,Literal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated,Any,Callable,Literal,TypeVar
 
 from fastapi.security import OAuth2PasswordBearer
 from storeapi.config import config
@@ -8,14 +11,52 @@ from jose import jwt, ExpiredSignatureError, JWTError
 from fastapi import HTTPException,status,Depends
 from passlib.context import CryptContext
 
+from storeapi import metrics
+from storeapi.cache import Cache,TTLCache
 from storeapi.database import database,user_table
+from storeapi.keys import load_key_set
+from storeapi.models.user import User
 
 logger=logging.getLogger(__name__)
 
 ALGORITHM=config.ALGORITHM
 SECRET_KEY=config.SECRET_KEY
+key_set=load_key_set(
+    ALGORITHM,SECRET_KEY,config.JWT_PRIVATE_KEY,config.JWT_KEY_ID,config.JWT_PUBLIC_KEYS
+)
 oauth2_scheme=OAuth2PasswordBearer(tokenUrl="token")
+# For endpoints that work without logging in but say more to a logged in user
+optional_oauth2_scheme=OAuth2PasswordBearer(tokenUrl="token",auto_error=False)
 pwd_context=CryptContext(schemes=["bcrypt"])
+# Users behind access tokens, keyed by token subject (email). Only public
+# fields are cached, never the password hash.
+user_cache=Cache(
+    "user",ttl=config.USER_CACHE_TTL_SECONDS,maxsize=config.USER_CACHE_MAX_SIZE
+)
+# bcrypt releases the GIL, so hashing in threads keeps the event loop free
+password_hash_executor=ThreadPoolExecutor(
+    max_workers=config.PASSWORD_HASH_WORKERS,thread_name_prefix="password-hash"
+)
+password_hash_pending=metrics.gauge("password_hash.pending")
+password_hash_rejected=metrics.counter("password_hash.rejected")
+password_hash_calls=metrics.counter("password_hash.calls")
+password_hash_wait_seconds=metrics.counter("password_hash.wait_seconds")
+# Claims of tokens that passed verification, keyed by the token itself, so
+# a client reusing its token skips the signature check
+token_cache=TTLCache(config.TOKEN_CACHE_MAX_SIZE)
+token_cache_hits=metrics.counter("token_cache.hits")
+token_cache_misses=metrics.counter("token_cache.misses")
+
+def token_cache_stats()->dict[str,float]:
+    lookups=token_cache_hits.value+token_cache_misses.value
+    return {
+        "size":len(token_cache),
+        "hit_rate":token_cache_hits.value/lookups if lookups else 0.0,
+    }
+
+metrics.register_collector("token_cache",token_cache_stats)
+
+T=TypeVar("T")
 
 def create_credentials_exception(detail:str)->HTTPException:
     return HTTPException(
@@ -37,7 +78,9 @@ def create_access_token(email:str):
         minutes=access_token_expire_minutes()
     )
     jwt_data={"sub":email,"exp":expire,"type":"access"}
-    encoded_jwt=jwt.encode(jwt_data,key=SECRET_KEY,algorithm=ALGORITHM)
+    encoded_jwt=jwt.encode(
+        jwt_data,key=key_set.signing_key,algorithm=ALGORITHM,headers=key_set.headers
+    )
     return encoded_jwt
 
 def create_confirmation_token(email:str):
@@ -46,16 +89,37 @@ def create_confirmation_token(email:str):
         minutes=confirm_token_expire_minutes()
     )
     jwt_data={"sub":email,"exp":expire,"type":"confirmation"}
-    encoded_jwt=jwt.encode(jwt_data,key=SECRET_KEY,algorithm=ALGORITHM)
+    encoded_jwt=jwt.encode(
+        jwt_data,key=key_set.signing_key,algorithm=ALGORITHM,headers=key_set.headers
+    )
     return encoded_jwt
 
-def get_subject_for_token_type(token:str,type:Literal["access","confirmation"])->str:
+def decode_token(token:str)->dict[str,Any]:
+    claims=token_cache.get(token)
+    if claims is not None:
+        token_cache_hits.inc()
+        return claims
+    token_cache_misses.inc()
     try:
-        payload=jwt.decode(token,key=SECRET_KEY,algorithms=[ALGORITHM])
+        key=key_set.verification_key(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise JWTError("token signed with an unknown key")
+        claims=jwt.decode(token,key=key,algorithms=[ALGORITHM])
     except ExpiredSignatureError as e:
         raise create_credentials_exception("token has expired") from e
     except JWTError as e:
         raise create_credentials_exception("invalid token") from e
+    # Kept no longer than the token is valid, so the cache never accepts
+    # an expired token
+    ttl=config.TOKEN_CACHE_TTL_SECONDS
+    if isinstance(claims.get("exp"),(int,float)):
+        ttl=min(ttl,claims["exp"]-time.time())
+    if ttl>0:
+        token_cache.set(token,claims,ttl)
+    return claims
+
+def get_subject_for_token_type(token:str,type:Literal["access","confirmation"])->str:
+    payload=decode_token(token)
     email=payload.get("sub")
     if email is None:
         raise create_credentials_exception("token is missing the sub field")
@@ -70,6 +134,35 @@ def get_password_hash(password:str)->str:
 def verify_password(plain_password:str,hashed_password:str)->bool:
     return pwd_context.verify(plain_password,hashed_password)
 
+async def run_in_password_hash_pool(func:Callable[...,T],*args)->T:
+    if password_hash_pending.value>=config.PASSWORD_HASH_MAX_PENDING:
+        password_hash_rejected.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="too many password checks in progress, try again shortly",
+            headers={"Retry-After":"1"}
+        )
+    loop=asyncio.get_running_loop()
+    queued_at=loop.time()
+
+    def timed()->T:
+        # Time spent waiting for a free worker thread
+        password_hash_calls.inc()
+        password_hash_wait_seconds.inc(loop.time()-queued_at)
+        return func(*args)
+
+    password_hash_pending.inc()
+    try:
+        return await loop.run_in_executor(password_hash_executor,timed)
+    finally:
+        password_hash_pending.dec()
+
+async def hash_password(password:str)->str:
+    return await run_in_password_hash_pool(get_password_hash,password)
+
+async def check_password(plain_password:str,hashed_password:str)->bool:
+    return await run_in_password_hash_pool(verify_password,plain_password,hashed_password)
+
 
 async def get_user(email:str):
     logger.debug("Fetching user from the database", extra={"email":email})
@@ -83,16 +176,25 @@ async def authenticate_user(email:str,password:str):
     user=await get_user(email)
     if not user:
         raise create_credentials_exception("invalid email or password")
-    if not verify_password(password,user.password):
+    if not await check_password(password,user.password):
         raise create_credentials_exception("invalid email or password")
     if not user.confirmed:
         raise create_credentials_exception("User has not confirmed email")
     return user
 
 
-async def get_current_user(token:Annotated[str,Depends(oauth2_scheme)]):
+async def invalidate_cached_user(email:str)->None:
+    logger.debug("invalidating cached user",extra={"email":email})
+    await user_cache.delete(email)
+
+async def get_current_user(token:Annotated[str,Depends(oauth2_scheme)])->User:
     email=get_subject_for_token_type(token,"access")
+    cached_user=await user_cache.get(email)
+    if cached_user is not None:
+        return User(**cached_user)
     user=await get_user(email)
     if user is None:
         raise create_credentials_exception("could not find user for this token")
-    return user
+    current_user=User(id=user.id,email=user.email,username=user.username)
+    await user_cache.set(email,current_user.model_dump())
+    return current_user
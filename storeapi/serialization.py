@@ -0,0 +1,57 @@
+import logging
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from storeapi.config import config
+
+logger = logging.getLogger(__name__)
+
+# Same output as pydantic for the types our rows hold: ISO 8601 datetimes
+# with "Z" for UTC
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+@lru_cache()
+def list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def dump_rows_fast(
+    rows: Sequence, model: type[BaseModel], exclude: frozenset[str] = frozenset()
+) -> bytes:
+    # Rows come from our own queries, whose columns are named after the
+    # model's fields, so they are encoded as they are instead of being
+    # validated one by one.
+    fields = tuple(field for field in model.model_fields if field not in exclude)
+    return orjson.dumps(
+        [{field: row[field] for field in fields} for row in rows], option=ORJSON_OPTIONS
+    )
+
+
+def dump_rows_validated(
+    rows: Sequence, model: type[BaseModel], exclude: frozenset[str] = frozenset()
+) -> bytes:
+    adapter = list_adapter(model)
+    return adapter.dump_json(
+        adapter.validate_python(rows, from_attributes=True),
+        exclude={"__all__": set(exclude)} if exclude else None,
+    )
+
+
+def dump_rows(
+    rows: Sequence, model: type[BaseModel], exclude: frozenset[str] = frozenset()
+) -> bytes:
+    # `exclude` leaves out optional fields the rows weren't queried with
+    if config.FAST_JSON_RESPONSES:
+        return dump_rows_fast(rows, model, exclude)
+    return dump_rows_validated(rows, model, exclude)
+
+
+def json_response(body: bytes, headers: Optional[dict[str, str]] = None) -> Response:
+    # Returned from routes that keep their response_model for the OpenAPI
+    # schema; FastAPI sends a Response as it is, without validating it again
+    return Response(body, media_type="application/json", headers=headers)
@@ -1,18 +1,30 @@
 import os
-from typing import AsyncGenerator
+from typing import AsyncGenerator,Callable,Optional
 import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec,rsa
 #from fastapi.testclient import TestClient
 from httpx import AsyncClient,ASGITransport
 
 os.environ["ENV_STATE"]="test"
 
+from storeapi import security #noqa:E402
+from storeapi.config import config #noqa:E402
 from storeapi.database import database,user_table #noqa:E402
+from storeapi.keys import KeySet,load_key_set #noqa:E402
 from storeapi.main import app  #noqa:E402
+from storeapi.migrations import upgrade_database #noqa:E402
+from storeapi.routers.post import feed_cache #noqa:E402
+from storeapi.security import user_cache #noqa:E402
 
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
 
+@pytest.fixture(scope="session",autouse=True)
+async def migrated_database()->None:
+    await upgrade_database(config.DATABASE_URL)
+
 # @pytest.fixture()
 # def client()->Generator:
 #     yield TestClient(app)
@@ -20,7 +32,11 @@ def anyio_backend():
 @pytest.fixture(autouse=True)
 async def db()->AsyncGenerator:
     await database.connect()
+    # Every test rolls the database back, so cached rows would go stale
+    await user_cache.clear()
+    await feed_cache.invalidate()
     if os.environ.get("ENV_STATE") == "test":
+        await database.execute("DELETE FROM follows")
         await database.execute("DELETE FROM comments")
         await database.execute("DELETE FROM posts")
         await database.execute("DELETE FROM users")
@@ -35,7 +51,7 @@ async def async_client()->AsyncGenerator:
 
 @pytest.fixture()
 async def registered_user(async_client:AsyncClient)->dict:
-    user_details={"email":"test@example.net","password":"1234"}
+    user_details={"email":"test@example.net","username":"test","password":"1234"}
     await async_client.post("/register",json=user_details)
     query=user_table.select().where(user_table.c.email==user_details["email"])
     user=await database.fetch_one(query)
@@ -54,6 +70,91 @@ async def confirmed_user(registered_user:dict)->dict:
 
 @pytest.fixture()
 async def logged_in_token(async_client:AsyncClient,confirmed_user:dict)->str:
-    response=await async_client.post("/token",json=confirmed_user)
+    response=await async_client.post(
+        "/token",
+        data={"username":confirmed_user["email"],"password":confirmed_user["password"]}
+    )
     return response.json()["access_token"]
 
+@pytest.fixture()
+def create_user()->Callable:
+    # Confirmed users written straight to the database, each with a token
+    async def create(name:str)->dict:
+        email=f"{name}@example.net"
+        user_id=await database.execute(user_table.insert().values(
+            email=email,username=name,password="x",confirmed=True
+        ))
+        token=security.create_access_token(email)
+        return {
+            "id":user_id,"email":email,"token":token,
+            "headers":{"Authorization":f"Bearer {token}"},
+        }
+    return create
+
+@pytest.fixture()
+def create_post(async_client:AsyncClient)->Callable:
+    async def create(body:str,token:str)->dict:
+        response=await async_client.post(
+            "/post",
+            json={"body":body},
+            headers={"Authorization":f"Bearer {token}"}
+        )
+        return response.json()
+    return create
+
+@pytest.fixture()
+def create_comment(async_client:AsyncClient)->Callable:
+    async def create(body:str,post_id:int,token:str)->dict:
+        response=await async_client.post(
+            "/comment",
+            json={"body":body,"post_id":post_id},
+            headers={"Authorization":f"Bearer {token}"}
+        )
+        return response.json()
+    return create
+
+@pytest.fixture()
+def like_post(async_client:AsyncClient)->Callable:
+    async def like(post_id:int,token:str)->dict:
+        response=await async_client.post(
+            "/like",
+            json={"post_id":post_id},
+            headers={"Authorization":f"Bearer {token}"}
+        )
+        return response.json()
+    return like
+
+@pytest.fixture()
+async def created_post(create_post:Callable,logged_in_token:str)->dict:
+    return await create_post("Test post",logged_in_token)
+
+@pytest.fixture()
+async def created_comment(
+    create_comment:Callable,created_post:dict,logged_in_token:str
+)->dict:
+    return await create_comment("Test comment",created_post["id"],logged_in_token)
+
+def private_key_pem(algorithm:str)->str:
+    if algorithm.startswith("RS"):
+        private_key=rsa.generate_private_key(public_exponent=65537,key_size=2048)
+    else:
+        private_key=ec.generate_private_key(ec.SECP256R1())
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+@pytest.fixture()
+def use_signing_key(mocker)->Callable[...,KeySet]:
+    # Signs and verifies tokens with a new private key for the rest of the test
+    def use(
+        algorithm:str,key_id:Optional[str]=None,public_keys:Optional[dict[str,str]]=None
+    )->KeySet:
+        key_set=load_key_set(
+            algorithm,"unused",private_key_pem(algorithm),key_id,public_keys
+        )
+        mocker.patch.object(security,"ALGORITHM",algorithm)
+        mocker.patch.object(security,"key_set",key_set)
+        return key_set
+    return use
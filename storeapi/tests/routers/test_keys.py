@@ -0,0 +1,25 @@
+import pytest
+from httpx import AsyncClient
+from jose import jwk,jwt
+
+from storeapi import security
+
+
+@pytest.mark.anyio
+async def test_jwks_is_empty_for_shared_secret(async_client:AsyncClient):
+    response=await async_client.get("/.well-known/jwks.json")
+    assert response.status_code==200
+    assert response.json()=={"keys":[]}
+
+@pytest.mark.anyio
+async def test_jwks_verifies_tokens(async_client:AsyncClient,use_signing_key):
+    use_signing_key("RS256")
+    token=security.create_access_token("test@example.net")
+
+    response=await async_client.get("/.well-known/jwks.json")
+    assert "max-age" in response.headers["cache-control"]
+    [key]=response.json()["keys"]
+    assert key["kid"]==jwt.get_unverified_header(token)["kid"]
+    # What a service holding only the key set would do
+    claims=jwt.decode(token,key=jwk.construct(key),algorithms=[key["alg"]])
+    assert claims["sub"]=="test@example.net"
@@ -0,0 +1,79 @@
+from typing import Callable
+
+import pytest
+from httpx import AsyncClient
+
+from storeapi.routers.search import fts5_query
+
+
+async def search(async_client:AsyncClient,q:str,**params)->list[tuple[str,str]]:
+    response=await async_client.get("/search",params={"q":q,**params})
+    assert response.status_code==200
+    return [(result["kind"],result["body"]) for result in response.json()]
+
+
+@pytest.mark.anyio
+async def test_fts5_query_quotes_terms():
+    assert fts5_query('dogs AND "cats" -(birds*')=='"dogs" "AND" "cats" "birds"'
+    assert fts5_query("!!")==""
+
+
+@pytest.mark.anyio
+async def test_search_posts_and_comments(
+    async_client:AsyncClient,logged_in_token:str,create_post:Callable,create_comment:Callable
+):
+    post=await create_post("Running with my dog",logged_in_token)
+    await create_post("Cats sleep all day",logged_in_token)
+    await create_comment("What a good dog",post["id"],logged_in_token)
+    results=await search(async_client,"dogs")
+    assert sorted(results)==[("comment","What a good dog"),("post","Running with my dog")]
+    assert await search(async_client,"cat sleeping")==[("post","Cats sleep all day")]
+    assert await search(async_client,"parrot")==[]
+    assert await search(async_client,"!!")==[]
+
+
+@pytest.mark.anyio
+async def test_search_ranks_better_matches_first(
+    async_client:AsyncClient,logged_in_token:str,create_post:Callable
+):
+    await create_post("dog and a long story about many other things entirely",logged_in_token)
+    await create_post("dog dog dog",logged_in_token)
+    results=await search(async_client,"dog")
+    assert results[0]==("post","dog dog dog")
+
+
+@pytest.mark.anyio
+async def test_search_follows_edits_and_deletes(
+    async_client:AsyncClient,logged_in_token:str,create_post:Callable,create_comment:Callable
+):
+    headers={"Authorization":f"Bearer {logged_in_token}"}
+    post=await create_post("Hello world",logged_in_token)
+    await create_comment("hello back",post["id"],logged_in_token)
+    await async_client.put(f"/post/{post['id']}",json={"body":"Goodbye world"},headers=headers)
+    assert await search(async_client,"hello")==[("comment","hello back")]
+    assert await search(async_client,"goodbye")==[("post","Goodbye world")]
+
+    await async_client.delete(f"/post/{post['id']}",headers=headers)
+    assert await search(async_client,"world")==[]
+    assert await search(async_client,"hello")==[]
+
+
+@pytest.mark.anyio
+async def test_search_pagination(async_client:AsyncClient,logged_in_token:str,create_post:Callable):
+    for i in range(5):
+        await create_post(f"post number {i} about gardens",logged_in_token)
+    response=await async_client.get("/search",params={"q":"garden","limit":3})
+    first_page=response.json()
+    assert len(first_page)==3
+    after=response.headers["X-Next-Cursor"]
+    response=await async_client.get("/search",params={"q":"garden","limit":3,"after":after})
+    second_page=response.json()
+    assert "X-Next-Cursor" not in response.headers
+    ids=[result["id"] for result in first_page+second_page]
+    assert len(ids)==5 and len(set(ids))==5
+
+
+@pytest.mark.anyio
+async def test_search_invalid_cursor(async_client:AsyncClient):
+    response=await async_client.get("/search",params={"q":"x","after":"abc"})
+    assert response.status_code==400
@@ -1,38 +1,31 @@
-import contextlib
-import os
+import asyncio
+import io
 import pathlib
-import tempfile 
+from concurrent.futures import ThreadPoolExecutor
 
-import pytest 
+import pytest
+from fastapi import UploadFile
 from httpx import AsyncClient
+from PIL import Image
+
+from storeapi.libs.local import LocalStorage
+from storeapi.libs.storage import MemoryStorage, StorageUnavailable, get_storage
+from storeapi.libs.streaming import stream_upload
+from storeapi.main import app, lifespan
 
 
 @pytest.fixture()
-def sample_image(fs)->pathlib.Path:
-    path=(pathlib.Path(__file__).parent/ "assets"/ "myfile.png").resolve()
-    fs.create_file(path)
+def sample_image(tmp_path)->pathlib.Path:
+    path=tmp_path/"myfile.png"
+    path.write_bytes(b"\x89PNG"+b"x"*(3*1024*1024))
     return path
 
 @pytest.fixture(autouse=True)
-def mock_b2_upload_file(mocker):
-    return mocker.patch(
-        "storeapi.routers.upload.b2_upload_file", return_value="https://fakeurl.com"
-    )
-
-@pytest.fixture(autouse=True)
-def aiofiles_mock_open(mocker,fs):
-    mock_open=mocker.patch("aiofiles.open")
-
-    @contextlib.asynccontextmanager
-    async def async_file_open(fname:str,mode:str="r"):
-        out_fs_mock=mocker.AsyncMock(name=f"async_file_open:{fname!r}/{mode!r}")
-        with open(fname,mode) as fin:
-            out_fs_mock.read.side_effect=fin.read
-            out_fs_mock.write.side_effect=fin.write
-            yield out_fs_mock
-
-    mock_open.side_effect=async_file_open
-    return mock_open
+def storage()->MemoryStorage:
+    storage=MemoryStorage()
+    app.dependency_overrides[get_storage]=lambda:storage
+    yield storage
+    app.dependency_overrides.pop(get_storage)
 
 async def call_upload_endpoint(
         async_client:AsyncClient,token:str,sample_image:pathlib.Path
@@ -43,21 +36,128 @@ async def call_upload_endpoint(
         headers={"Authorization":f"Bearer {token}"}
     )
 
-@pytest.mark.anyio 
+@pytest.mark.anyio
 async def test_upload_image(
-    async_client:AsyncClient,logged_in_token:str,sample_image:pathlib.Path
+    async_client:AsyncClient,logged_in_token:str,sample_image:pathlib.Path,
+    storage:MemoryStorage
 ):
     response=await call_upload_endpoint(async_client,logged_in_token,sample_image)
     assert response.status_code==201
-    assert response.json()["file_url"]=="https://fakeurl.com"
+    assert response.json()["file_url"]=="memory://myfile.png"
+    assert storage.files["myfile.png"]==sample_image.read_bytes()
+
+@pytest.mark.anyio
+async def test_upload_image_creates_variants(
+    async_client:AsyncClient,logged_in_token:str,storage:MemoryStorage,tmp_path
+):
+    image_path=tmp_path/"photo.png"
+    Image.new("RGB",(1600,1200),color="blue").save(image_path)
+    response=await call_upload_endpoint(async_client,logged_in_token,image_path)
+    assert response.status_code==201
+    assert response.json()["variants"]=={
+        "thumbnail":"memory://photo.thumbnail.jpg",
+        "feed":"memory://photo.feed.jpg",
+        "webp":"memory://photo.webp.webp",
+    }
+    with Image.open(io.BytesIO(storage.files["photo.thumbnail.jpg"])) as thumbnail:
+        assert thumbnail.size==(320,240)
 
 @pytest.mark.anyio
-async def test_temp_file_removed_after_upload(
-    async_client:AsyncClient,logged_in_token:str,sample_image:pathlib.Path,mocker
+async def test_upload_invalid_image_has_no_variants(
+    async_client:AsyncClient,logged_in_token:str,sample_image:pathlib.Path
 ):
-    named_temp_file_spy=mocker.spy(tempfile,"NamedTemporaryFile")
+    response=await call_upload_endpoint(async_client,logged_in_token,sample_image)
+    assert response.status_code==201
+    assert response.json()["variants"]=={}
 
+@pytest.mark.anyio
+async def test_upload_image_local_storage(
+    async_client:AsyncClient,logged_in_token:str,sample_image:pathlib.Path,tmp_path,
+    monkeypatch
+):
+    storage=LocalStorage(str(tmp_path/"storage"))
+    monkeypatch.setitem(app.dependency_overrides,get_storage,lambda:storage)
     response=await call_upload_endpoint(async_client,logged_in_token,sample_image)
     assert response.status_code==201
-    created_temp_file=named_temp_file_spy.spy_return
-    assert not os.path.exists(created_temp_file.name)
\ No newline at end of file
+    stored=tmp_path/"storage"/"myfile.png"
+    assert response.json()["file_url"]==stored.as_uri()
+    assert stored.read_bytes()==sample_image.read_bytes()
+
+@pytest.mark.anyio
+async def test_upload_error(
+    async_client:AsyncClient,logged_in_token:str,sample_image:pathlib.Path,
+    storage:MemoryStorage,mocker
+):
+    mocker.patch.object(storage,"upload_stream",side_effect=OSError("disk full"))
+    response=await call_upload_endpoint(async_client,logged_in_token,sample_image)
+    assert response.status_code==500
+
+@pytest.mark.anyio
+async def test_upload_storage_unavailable(
+    async_client:AsyncClient,logged_in_token:str,sample_image:pathlib.Path,
+    storage:MemoryStorage,mocker
+):
+    mocker.patch.object(storage,"upload_stream",side_effect=StorageUnavailable("b2 is down"))
+    response=await call_upload_endpoint(async_client,logged_in_token,sample_image)
+    assert response.status_code==503
+    assert "Retry-After" in response.headers
+
+@pytest.mark.anyio
+async def test_stream_upload_bounds_buffered_chunks():
+    file=UploadFile(io.BytesIO(b"a"*1000),filename="a.txt")
+    chunks_read=[]
+    max_in_flight=0
+
+    original_read=file.read
+    async def counting_read(size:int=-1)->bytes:
+        chunk=await original_read(size)
+        if chunk:
+            chunks_read.append(len(chunk))
+        return chunk
+    file.read=counting_read
+
+    def slow_sink(stream)->bytes:
+        nonlocal max_in_flight
+        data=b""
+        while block:=stream.read(10):
+            # Chunks the request side has read ahead of this thread
+            max_in_flight=max(max_in_flight,sum(chunks_read)-len(data))
+            data+=block
+        return data
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        data=await stream_upload(
+            file,slow_sink,executor,chunk_size=10,max_buffered_chunks=2
+        )
+    assert data==b"a"*1000
+    # two buffered chunks plus the one being read and the one held by put()
+    assert max_in_flight<=4*10
+
+@pytest.mark.anyio
+async def test_stream_upload_sink_failure_stops_reading():
+    file=UploadFile(io.BytesIO(b"a"*1000),filename="a.txt")
+
+    def failing_sink(stream)->None:
+        stream.read(10)
+        raise OSError("storage unavailable")
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(OSError):
+            await asyncio.wait_for(
+                stream_upload(
+                    file,failing_sink,executor,chunk_size=10,max_buffered_chunks=2
+                ),
+                timeout=5,
+            )
+    assert await file.read()!=b""
+
+@pytest.mark.anyio
+async def test_lifespan_shuts_down_image_workers(mocker):
+    shutdown=mocker.patch("storeapi.main.image_executor.shutdown")
+    mocker.patch("storeapi.main.database.connect")
+    mocker.patch("storeapi.main.database.disconnect")
+    mocker.patch("storeapi.main.check_schema_version")
+    mocker.patch("storeapi.main.configure_logging")
+    async with lifespan(app):
+        shutdown.assert_not_called()
+    shutdown.assert_called_once_with(cancel_futures=True)
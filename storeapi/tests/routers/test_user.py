@@ -1,6 +1,10 @@
+import asyncio
+import time
+
 import pytest 
 from httpx import AsyncClient
 from fastapi import Request
+from storeapi import security
 async def register_user(async_client:AsyncClient,email:str, password:str):
     return await async_client.post("/register",json={"email":email,
     "password":password})
@@ -83,4 +87,37 @@ async def test_login_user(async_client:AsyncClient,confirmed_user:dict):
             "password":confirmed_user["password"]
         }
     )
-    assert response.status_code==200
\ No newline at end of file
+    assert response.status_code==200
+
+@pytest.mark.anyio
+async def test_feed_latency_flat_under_concurrent_logins(
+    async_client:AsyncClient,confirmed_user:dict
+):
+    hashed=security.get_password_hash(confirmed_user["password"])
+    start=time.perf_counter()
+    security.verify_password(confirmed_user["password"],hashed)
+    single_hash_seconds=time.perf_counter()-start
+
+    async def login():
+        response=await async_client.post(
+            "/token",
+            data={"username":confirmed_user["email"],"password":confirmed_user["password"]}
+        )
+        assert response.status_code==200
+
+    async def timed_feed()->float:
+        start=time.perf_counter()
+        response=await async_client.get("/post")
+        assert response.status_code==200
+        return time.perf_counter()-start
+
+    logins=asyncio.gather(*(login() for _ in range(8)))
+    feed_latencies=[]
+    while not logins.done():
+        feed_latencies.append(await timed_feed())
+    await logins
+
+    # If bcrypt ran on the event loop, a feed request issued during the
+    # logins would wait out at least one whole hash.
+    assert feed_latencies
+    assert max(feed_latencies)<single_hash_seconds
@@ -0,0 +1,84 @@
+import pytest
+
+from storeapi import metrics
+from storeapi.cache import (
+    Cache,
+    MemoryCacheBackend,
+    ResponseCache,
+    TTLCache,
+    create_cache_backend,
+)
+
+
+@pytest.mark.anyio
+async def test_ttl_cache_expires():
+    cache=TTLCache(maxsize=10)
+    cache.set("a",1,ttl=60)
+    cache.set("b",2,ttl=0)
+    assert cache.get("a")==1
+    assert cache.get("b") is None
+    assert len(cache)==1
+
+
+@pytest.mark.anyio
+async def test_ttl_cache_evicts_least_recently_used():
+    cache=TTLCache(maxsize=2)
+    cache.set("a",1,ttl=60)
+    cache.set("b",2,ttl=60)
+    cache.get("a")
+    cache.set("c",3,ttl=60)
+    assert cache.get("a")==1
+    assert cache.get("b") is None
+    assert cache.get("c")==3
+
+
+@pytest.mark.anyio
+async def test_ttl_cache_clear_prefix():
+    cache=TTLCache(maxsize=10)
+    cache.set("user:a",1,ttl=60)
+    cache.set("feed:a",2,ttl=60)
+    cache.clear("user:")
+    assert cache.get("user:a") is None
+    assert cache.get("feed:a")==2
+
+
+@pytest.mark.anyio
+async def test_create_cache_backend():
+    assert isinstance(create_cache_backend(None,10),MemoryCacheBackend)
+    with pytest.raises(ValueError):
+        create_cache_backend("ftp://example.net",10)
+
+
+@pytest.mark.anyio
+async def test_cache_hit_rate_metrics():
+    cache=Cache("test",ttl=60)
+    await cache.get("a")
+    await cache.set("a",{"id":1})
+    assert await cache.get("a")=={"id":1}
+    snapshot=metrics.snapshot()
+    assert snapshot["test_cache.hits"]==1
+    assert snapshot["test_cache.misses"]==1
+    assert snapshot["test_cache.hit_rate"]==0.5
+
+
+@pytest.mark.anyio
+async def test_response_cache_invalidate():
+    cache=ResponseCache("test_response",ttl=60)
+    generation=await cache.generation()
+    await cache.set_response(generation,"page",b"[]",{"X-Next-Cursor":"abc"})
+    cached=await cache.get_response(await cache.generation(),"page")
+    assert cached.body==b"[]"
+    assert cached.headers=={"X-Next-Cursor":"abc"}
+    await cache.invalidate()
+    assert await cache.get_response(await cache.generation(),"page") is None
+
+
+@pytest.mark.anyio
+async def test_response_cache_drops_response_rendered_before_invalidate():
+    cache=ResponseCache("test_response_race",ttl=60)
+    generation=await cache.generation()
+    # A write lands while the page is being rendered from the old rows
+    await cache.invalidate()
+    await cache.set_response(generation,"page",b"[]",{})
+    assert await cache.get_response(await cache.generation(),"page") is None
+    assert "test_response_race_cache.mean_hit_age_seconds" in metrics.snapshot()
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from storeapi import events
+from storeapi.events import EventHub, LocalPubSub, format_event
+from storeapi.routers.events import HEARTBEAT_FRAME, RETRY_FRAME, event_stream
+
+
+@pytest.fixture()
+async def started_events():
+    await events.startup()
+    yield events.hub
+    await events.shutdown()
+
+
+@pytest.mark.anyio
+async def test_format_event():
+    assert format_event("post_deleted",{"id":1})==b'event: post_deleted\ndata: {"id":1}\n\n'
+
+
+@pytest.mark.anyio
+async def test_hub_fans_out_through_local_pubsub():
+    hub=EventHub(queue_size=10,max_subscribers=10)
+    pubsub=LocalPubSub()
+    await pubsub.start(hub.broadcast)
+    first,second=hub.subscribe(),hub.subscribe()
+    await pubsub.publish(b"frame")
+    assert first.queue.get_nowait()==b"frame"
+    assert second.queue.get_nowait()==b"frame"
+
+
+@pytest.mark.anyio
+async def test_hub_drops_slow_subscriber():
+    hub=EventHub(queue_size=1,max_subscribers=10)
+    slow,fast=hub.subscribe(),hub.subscribe()
+    hub.broadcast(b"one")
+    fast.queue.get_nowait()
+    hub.broadcast(b"two")
+    assert slow.closed
+    assert not fast.closed
+    assert hub._subscribers=={fast}
+
+
+@pytest.mark.anyio
+async def test_event_stream():
+    hub=events.hub
+    stream=event_stream(heartbeat=0.01)
+    assert await anext(stream)==RETRY_FRAME
+    (subscriber,)=hub._subscribers
+    assert await anext(stream)==HEARTBEAT_FRAME
+    hub.broadcast(b"frame")
+    assert await anext(stream)==b"frame"
+    subscriber.close()
+    with pytest.raises(StopAsyncIteration):
+        await anext(stream)
+    assert not hub._subscribers
+
+
+@pytest.mark.anyio
+async def test_event_stream_closed_early_unsubscribes():
+    stream=event_stream(heartbeat=0.01)
+    assert await anext(stream)==RETRY_FRAME
+    await stream.aclose()
+    assert not events.hub._subscribers
+
+
+@pytest.mark.anyio
+async def test_stream_events_too_many_subscribers(async_client:AsyncClient,monkeypatch):
+    monkeypatch.setattr(events.hub,"max_subscribers",0)
+    response=await async_client.get("/events")
+    assert response.status_code==503
+
+
+@pytest.mark.anyio
+async def test_post_handlers_publish_events(
+    async_client:AsyncClient,logged_in_token:str,started_events:EventHub
+):
+    subscriber=started_events.subscribe()
+    headers={"Authorization":f"Bearer {logged_in_token}"}
+    post=(await async_client.post("/post",json={"body":"Test post"},headers=headers)).json()
+    await async_client.post("/like",json={"post_id":post["id"]},headers=headers)
+    await async_client.post("/comment",json={"body":"Comment","post_id":post["id"]},headers=headers)
+    await async_client.delete(f"/post/{post['id']}",headers=headers)
+
+    frames=[]
+    while not subscriber.queue.empty():
+        frames.append(await asyncio.wait_for(subscriber.queue.get(),1))
+    assert [frame.split(b"\n")[0] for frame in frames]==[
+        b"event: post_created",
+        b"event: post_liked",
+        b"event: comment_created",
+        b"event: post_deleted",
+    ]
+    assert b'"body":"Test post"' in frames[0]
@@ -0,0 +1,69 @@
+import datetime
+from typing import Callable
+
+import pytest
+from httpx import AsyncClient
+
+from storeapi import hot
+from storeapi.database import database, post_table
+from storeapi.hot import HALF_LIFE_SECONDS, HotRanker, hot_score
+
+NOW=datetime.datetime(2026,1,1,tzinfo=datetime.UTC)
+
+
+@pytest.mark.anyio
+async def test_hot_score_halves_with_age():
+    older=NOW-datetime.timedelta(seconds=HALF_LIFE_SECONDS)
+    assert hot_score(3,0,older)==pytest.approx(hot_score(1,0,NOW))
+    assert hot_score(0,1,NOW)==hot_score(2,0,NOW)
+    assert hot_score(1,0,NOW.replace(tzinfo=None))==hot_score(1,0,NOW)
+
+
+async def hot_feed(async_client:AsyncClient)->list[str]:
+    response=await async_client.get("/post",params={"sorting":"hot"})
+    return [post["body"] for post in response.json()]
+
+
+@pytest.mark.anyio
+async def test_scores_are_recomputed_in_the_background(
+    async_client:AsyncClient,logged_in_token:str,create_post:Callable
+):
+    ranker=HotRanker(interval=60)
+    old=(await create_post("old",logged_in_token))["id"]
+    await create_post("new",logged_in_token)
+    await database.execute(
+        post_table.update().where(post_table.c.id==old).values(like_count=10)
+    )
+    ranker.mark(old)
+    assert ranker.pending.value==1
+    await ranker.flush()
+    assert ranker.pending.value==0
+    assert await hot_feed(async_client)==["old","new"]
+
+
+@pytest.mark.anyio
+async def test_failed_recompute_is_retried(monkeypatch):
+    ranker=HotRanker(interval=60)
+    calls=[]
+    async def failing(post_ids):
+        calls.append(set(post_ids))
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(hot,"recompute",failing)
+    ranker.mark(1)
+    await ranker.flush()
+    ranker.mark(2)
+    await ranker.flush()
+    assert calls==[{1},{1,2}]
+
+
+@pytest.mark.anyio
+async def test_stop_flushes_pending_posts(monkeypatch):
+    ranker=HotRanker(interval=60)
+    recomputed=[]
+    async def recompute(post_ids):
+        recomputed.append(set(post_ids))
+    monkeypatch.setattr(hot,"recompute",recompute)
+    ranker.start()
+    ranker.mark(1)
+    await ranker.stop()
+    assert recomputed==[{1}]
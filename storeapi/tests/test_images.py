@@ -0,0 +1,42 @@
+import io
+
+import pytest
+from PIL import Image
+
+from storeapi.libs.images import VARIANTS, render_variants, variant_file_name
+
+
+def make_image(size:tuple[int,int],mode:str="RGBA",format:str="PNG")->bytes:
+    output=io.BytesIO()
+    Image.new(mode,size,color="red").save(output,format)
+    return output.getvalue()
+
+
+@pytest.mark.anyio
+async def test_render_variants():
+    rendered=render_variants(make_image((2000,1000)))
+    assert set(rendered)=={variant.name for variant in VARIANTS}
+    with Image.open(io.BytesIO(rendered["thumbnail"])) as thumbnail:
+        assert thumbnail.format=="JPEG"
+        assert thumbnail.size==(320,160)
+    with Image.open(io.BytesIO(rendered["webp"])) as webp:
+        assert webp.format=="WEBP"
+        assert webp.size==(1080,540)
+
+
+@pytest.mark.anyio
+async def test_render_variants_does_not_upscale():
+    rendered=render_variants(make_image((100,50),mode="RGB",format="JPEG"))
+    with Image.open(io.BytesIO(rendered["feed"])) as feed:
+        assert feed.size==(100,50)
+
+
+@pytest.mark.anyio
+async def test_render_variants_not_an_image():
+    with pytest.raises(OSError):
+        render_variants(b"not an image")
+
+
+@pytest.mark.anyio
+async def test_variant_file_name():
+    assert variant_file_name("photo.png",VARIANTS[0])=="photo.thumbnail.jpg"
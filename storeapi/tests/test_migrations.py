@@ -0,0 +1,96 @@
+import databases
+import pytest
+
+from storeapi import migrations
+from storeapi.config import config
+
+
+@pytest.fixture()
+async def empty_db(tmp_path):
+    db=databases.Database(f"sqlite:///{tmp_path / 'migrations.db'}")
+    await db.connect()
+    yield db
+    await db.disconnect()
+
+
+@pytest.mark.anyio
+async def test_upgrade_empty_database(empty_db:databases.Database):
+    applied=await migrations.upgrade(empty_db)
+    assert applied==list(range(1,migrations.head_version()+1))
+    assert await migrations.current_version(empty_db)==migrations.head_version()
+    await migrations.check_schema_version(empty_db)
+
+
+@pytest.mark.anyio
+async def test_upgrade_is_idempotent(empty_db:databases.Database):
+    await migrations.upgrade(empty_db)
+    assert await migrations.upgrade(empty_db)==[]
+
+
+@pytest.mark.anyio
+async def test_upgrade_to_target(empty_db:databases.Database):
+    assert await migrations.upgrade(empty_db,target=1)==[1]
+    assert not await migrations.column_exists(empty_db,"posts","like_count")
+    with pytest.raises(migrations.SchemaVersionError):
+        await migrations.check_schema_version(empty_db)
+
+
+@pytest.mark.anyio
+async def test_check_schema_version_uninitialized(empty_db:databases.Database):
+    with pytest.raises(migrations.SchemaVersionError):
+        await migrations.check_schema_version(empty_db)
+
+
+@pytest.mark.anyio
+async def test_upgrade_backfills_legacy_database(empty_db:databases.Database):
+    await migrations.upgrade(empty_db,target=1)
+    await empty_db.execute("INSERT INTO users (id, email, username) VALUES (1, 'a@b.c', 'a')")
+    await empty_db.execute("INSERT INTO posts (id, body, user_id) VALUES (1, 'a', 1), (2, 'b', 1)")
+    await empty_db.execute("INSERT INTO likes (post_id, user_id) VALUES (1, 1), (1, 1), (2, 1)")
+
+    await migrations.upgrade(empty_db)
+
+    rows=await empty_db.fetch_all("SELECT id, like_count FROM posts ORDER BY id")
+    assert [(row["id"],row["like_count"]) for row in rows]==[(1,1),(2,1)]
+    with pytest.raises(Exception):
+        await empty_db.execute("INSERT INTO likes (post_id, user_id) VALUES (2, 1)")
+
+
+@pytest.mark.anyio
+async def test_upgrade_indexes_existing_posts_for_search(empty_db:databases.Database):
+    await migrations.upgrade(empty_db,target=7)
+    await empty_db.execute("INSERT INTO users (id, email, username) VALUES (1, 'a@b.c', 'a')")
+    await empty_db.execute("INSERT INTO posts (id, body, user_id) VALUES (1, 'hello world', 1)")
+    await empty_db.execute(
+        "INSERT INTO comments (id, body, post_id, user_id) VALUES (1, 'hello there', 1, 1)"
+    )
+
+    await migrations.upgrade(empty_db)
+
+    rows=await empty_db.fetch_all(
+        "SELECT kind, ref_id FROM search_documents WHERE search_documents MATCH 'hello' "
+        "ORDER BY rowid"
+    )
+    assert [(row["kind"],row["ref_id"]) for row in rows]==[("post",1),("comment",1)]
+
+
+@pytest.mark.anyio
+async def test_upgrade_marks_posts_that_were_not_fanned_out(
+    empty_db:databases.Database,monkeypatch
+):
+    monkeypatch.setattr(config,"TIMELINE_FANOUT_MAX_FOLLOWERS",1)
+    await migrations.upgrade(empty_db,target=9)
+    await empty_db.execute(
+        "INSERT INTO users (id, email, username, follower_count) "
+        "VALUES (1, 'a@b.c', 'a', 2), (2, 'b@b.c', 'b', 1)"
+    )
+    await empty_db.execute("INSERT INTO posts (id, body, user_id) VALUES (1, 'a', 1), (2, 'b', 2)")
+
+    await migrations.upgrade(empty_db)
+
+    rows=await empty_db.fetch_all("SELECT id, fanned_out FROM posts ORDER BY id")
+    assert [(row["id"],bool(row["fanned_out"])) for row in rows]==[(1,False),(2,True)]
+    rows=await empty_db.fetch_all("SELECT id, has_unfanned_posts FROM users ORDER BY id")
+    assert [(row["id"],bool(row["has_unfanned_posts"])) for row in rows]==[(1,True),(2,False)]
+    rows=await empty_db.fetch_all("SELECT user_id, post_id FROM timeline ORDER BY post_id")
+    assert [(row["user_id"],row["post_id"]) for row in rows]==[(1,1),(2,2)]
@@ -0,0 +1,74 @@
+import pytest
+from httpx import AsyncClient
+
+from storeapi import replicas, security
+from storeapi.database import database
+
+
+class Replica:
+    # Answers from the test database and counts the queries it was sent
+    def __init__(self)->None:
+        self.queries=0
+
+    async def fetch_all(self,query):
+        self.queries+=1
+        return await database.fetch_all(query)
+
+    async def fetch_val(self,query):
+        self.queries+=1
+        return await database.fetch_val(query)
+
+
+@pytest.fixture()
+async def replica(monkeypatch)->Replica:
+    replica=Replica()
+    monkeypatch.setattr(replicas,"replicas",[replica])
+    await replicas.recent_writers.clear()
+    return replica
+
+
+@pytest.mark.anyio
+async def test_reads_use_primary_without_replicas():
+    assert await replicas.read_database(None) is database
+    assert not replicas.reads_own_writes(database)
+
+
+@pytest.mark.anyio
+async def test_anonymous_and_invalid_tokens_read_replicas(replica:Replica):
+    assert await replicas.read_database(None) is replica
+    assert await replicas.read_database("Bearer not-a-token") is replica
+    assert await replicas.read_database("Basic abc") is replica
+
+
+@pytest.mark.anyio
+async def test_recent_writer_reads_primary(replica:Replica):
+    token=security.create_access_token("test@example.net")
+    assert await replicas.read_database(f"Bearer {token}") is replica
+    await replicas.recent_writers.set("test@example.net",True)
+    assert await replicas.read_database(f"Bearer {token}") is database
+    assert replicas.reads_own_writes(database)
+
+
+@pytest.mark.anyio
+async def test_get_endpoints_read_replicas(async_client:AsyncClient,replica:Replica):
+    for url in ("/post","/post/1","/post/1/comment","/user/1/posts"):
+        await async_client.get(url)
+    assert replica.queries==4
+
+
+@pytest.mark.anyio
+async def test_author_reads_own_writes(
+    async_client:AsyncClient,logged_in_token:str,replica:Replica
+):
+    headers={"Authorization":f"Bearer {logged_in_token}"}
+    await async_client.get("/post",headers=headers)
+    assert replica.queries==1
+
+    response=await async_client.post("/post",json={"body":"Test Post"},headers=headers)
+    assert response.status_code==201
+    response=await async_client.get("/post",headers=headers)
+    assert response.headers["X-Cache"]=="MISS"
+    assert [post["body"] for post in response.json()]==["Test Post"]
+    # Everyone else keeps reading from the replica
+    await async_client.get("/post/1/comment")
+    assert replica.queries==2
@@ -1,6 +1,9 @@
+import time
+
 import pytest 
 from jose import jwt
 from storeapi import security
+from storeapi.keys import load_key_set
 
 
 @pytest.mark.anyio
@@ -90,6 +93,75 @@ async def test_get_subject_for_token_type_wrong_type():
         security.get_subject_for_token_type(token,"access")
     assert "token has incorrect type,expected access"<=exc_info.value.detail
 
+@pytest.mark.anyio
+async def test_get_subject_for_token_is_cached(mocker):
+    security.token_cache.clear()
+    token=security.create_access_token("cached@example.net")
+    spy=mocker.spy(security.jwt,"decode")
+    assert security.get_subject_for_token_type(token,"access")=="cached@example.net"
+    assert security.get_subject_for_token_type(token,"access")=="cached@example.net"
+    assert spy.call_count==1
+
+@pytest.mark.anyio
+async def test_cached_token_type_is_still_checked():
+    token=security.create_confirmation_token("cached@example.net")
+    security.get_subject_for_token_type(token,"confirmation")
+    with pytest.raises(security.HTTPException):
+        security.get_subject_for_token_type(token,"access")
+
+@pytest.mark.anyio
+async def test_token_cache_entry_ends_at_expiry(mocker):
+    mocker.patch("storeapi.security.access_token_expire_minutes",return_value=1)
+    token=security.create_access_token("expiring@example.net")
+    security.get_subject_for_token_type(token,"access")
+    expires_at,_=security.token_cache._entries[token]
+    assert expires_at-time.monotonic()<=60
+
+@pytest.mark.anyio
+async def test_invalid_token_is_not_cached():
+    with pytest.raises(security.HTTPException):
+        security.get_subject_for_token_type("invalid token","access")
+    assert security.token_cache.get("invalid token") is None
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("algorithm",["RS256","ES256"])
+async def test_asymmetric_token(use_signing_key,algorithm:str):
+    key_set=use_signing_key(algorithm,key_id="current")
+    token=security.create_access_token("test@example.net")
+    assert jwt.get_unverified_header(token)=={"alg":algorithm,"kid":"current","typ":"JWT"}
+    # Verifiable with nothing but the public key
+    public_key=key_set.verification_key("current").to_pem().decode()
+    claims=jwt.decode(token,key=public_key,algorithms=[algorithm])
+    assert claims["sub"]=="test@example.net"
+    assert security.get_subject_for_token_type(token,"access")=="test@example.net"
+    assert [key["kid"] for key in key_set.jwks()["keys"]]==["current"]
+
+@pytest.mark.anyio
+async def test_previous_public_key_still_verifies(use_signing_key):
+    previous=use_signing_key("RS256",key_id="old")
+    token=security.create_access_token("test@example.net")
+    use_signing_key(
+        "RS256",key_id="new",
+        public_keys={"old":previous.verification_key("old").to_pem().decode()},
+    )
+    security.token_cache.clear()
+    assert security.get_subject_for_token_type(token,"access")=="test@example.net"
+
+@pytest.mark.anyio
+async def test_unknown_key_id_is_rejected(use_signing_key):
+    use_signing_key("RS256",key_id="old")
+    token=security.create_access_token("test@example.net")
+    use_signing_key("RS256",key_id="new")
+    security.token_cache.clear()
+    with pytest.raises(security.HTTPException) as exc_info:
+        security.get_subject_for_token_type(token,"access")
+    assert exc_info.value.detail=="invalid token"
+
+@pytest.mark.anyio
+async def test_asymmetric_algorithm_requires_private_key():
+    with pytest.raises(ValueError):
+        load_key_set("RS256","secret")
+
 
 @pytest.mark.anyio
 async def test_authenticate_user(confirmed_user:dict):
@@ -124,4 +196,34 @@ async def test_get_current_user_wrong_type_token(registered_user:dict):
     token=security.create_confirmation_token(registered_user["email"])
 
     with pytest.raises(security.HTTPException):
-        await security.get_current_user(token)
\ No newline at end of file
+        await security.get_current_user(token)
+@pytest.mark.anyio
+async def test_get_current_user_is_cached(registered_user:dict,mocker):
+    token=security.create_access_token(registered_user["email"])
+    spy=mocker.spy(security,"get_user")
+    await security.get_current_user(token)
+    user=await security.get_current_user(token)
+    assert user.email==registered_user["email"]
+    assert spy.call_count==1
+
+@pytest.mark.anyio
+async def test_invalidate_cached_user(registered_user:dict,mocker):
+    token=security.create_access_token(registered_user["email"])
+    await security.get_current_user(token)
+    await security.invalidate_cached_user(registered_user["email"])
+    spy=mocker.spy(security,"get_user")
+    await security.get_current_user(token)
+    assert spy.call_count==1
+
+@pytest.mark.anyio
+async def test_hash_password_off_event_loop():
+    hashed=await security.hash_password("password")
+    assert await security.check_password("password",hashed)
+    assert not await security.check_password("wrong",hashed)
+
+@pytest.mark.anyio
+async def test_hash_password_rejects_when_saturated(mocker):
+    mocker.patch.object(security.config,"PASSWORD_HASH_MAX_PENDING",0)
+    with pytest.raises(security.HTTPException) as exc_info:
+        await security.hash_password("password")
+    assert exc_info.value.status_code==503
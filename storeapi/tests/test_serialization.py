@@ -0,0 +1,53 @@
+import pytest
+
+from storeapi.database import comment_table, database, post_table, user_table
+from storeapi.models.post import Comment, UserPostWithLikes
+from storeapi.routers.post import select_comments, select_post_and_likes
+from storeapi.serialization import dump_rows_fast, dump_rows_validated
+
+
+@pytest.fixture()
+async def rows()->None:
+    user_id=await database.execute(
+        user_table.insert().values(email="a@example.net",username="a",password="x")
+    )
+    post_id=await database.execute(
+        post_table.insert().values(
+            body="with variants",user_id=user_id,image_url="https://fakeurl.com/a.png",
+            image_variants={"thumbnail":"https://fakeurl.com/a.thumbnail.jpg"},
+        )
+    )
+    await database.execute(post_table.insert().values(body="plain é",user_id=user_id))
+    await database.execute(
+        comment_table.insert().values(body="comment",post_id=post_id,user_id=user_id)
+    )
+
+
+@pytest.mark.anyio
+async def test_fast_path_matches_validated_posts(rows):
+    posts=await database.fetch_all(select_post_and_likes)
+    assert len(posts)==2
+    assert dump_rows_fast(posts,UserPostWithLikes)==dump_rows_validated(
+        posts,UserPostWithLikes
+    )
+
+
+@pytest.mark.anyio
+async def test_fast_path_matches_validated_comments(rows):
+    comments=await database.fetch_all(select_comments)
+    assert len(comments)==1
+    assert dump_rows_fast(comments,Comment)==dump_rows_validated(comments,Comment)
+
+
+@pytest.mark.anyio
+async def test_fast_path_empty():
+    assert dump_rows_fast([],Comment)==b"[]"
+
+
+@pytest.mark.anyio
+async def test_dump_rows_exclude(rows):
+    posts=await database.fetch_all(select_post_and_likes)
+    exclude=frozenset({"image_variants","username"})
+    fast=dump_rows_fast(posts,UserPostWithLikes,exclude)
+    assert fast==dump_rows_validated(posts,UserPostWithLikes,exclude)
+    assert b'"username"' not in fast and b'"likes"' in fast
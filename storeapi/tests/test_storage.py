@@ -0,0 +1,92 @@
+import asyncio
+import io
+
+import pytest
+
+from storeapi.config import DevConfig, config
+from storeapi.libs import b2 as b2_storage
+from storeapi.libs.local import LocalStorage
+from storeapi.libs.storage import MemoryStorage, StorageUnavailable, get_storage
+
+
+@pytest.fixture()
+def b2_api(mocker):
+    api=mocker.patch.object(b2_storage.b2,"B2Api").return_value
+    api.get_download_url_for_fileid.return_value="https://fakeurl.com"
+    return api
+
+
+@pytest.mark.anyio
+async def test_get_storage_from_config():
+    assert config.STORAGE_BACKEND=="memory"
+    assert isinstance(get_storage(),MemoryStorage)
+
+
+@pytest.mark.anyio
+async def test_memory_storage():
+    storage=MemoryStorage()
+    assert storage.upload_stream(io.BytesIO(b"data"),"a.txt")=="memory://a.txt"
+    assert storage.files=={"a.txt":b"data"}
+
+
+@pytest.mark.anyio
+async def test_local_storage_keeps_files_in_directory(tmp_path):
+    storage=LocalStorage(str(tmp_path))
+    await storage.startup()
+    url=storage.upload_stream(io.BytesIO(b"data"),"../../escape.txt")
+    assert url==(tmp_path/"escape.txt").as_uri()
+    assert (tmp_path/"escape.txt").read_bytes()==b"data"
+
+
+@pytest.mark.anyio
+async def test_b2_storage_authorizes_at_startup(b2_api):
+    storage=b2_storage.B2Storage("key","secret","bucket")
+    await storage.startup()
+    try:
+        b2_api.authorize_account.assert_called_once_with("production","key","secret")
+        assert storage.upload_stream(io.BytesIO(b"data"),"a.txt")=="https://fakeurl.com"
+        # Uploads reuse the authorization done at startup
+        b2_api.authorize_account.assert_called_once()
+    finally:
+        await storage.shutdown()
+
+
+@pytest.mark.anyio
+async def test_b2_storage_refreshes_authorization(b2_api,mocker):
+    mocker.patch.object(config,"B2_AUTH_REFRESH_SECONDS",0.01)
+    storage=b2_storage.B2Storage("key","secret","bucket")
+    await storage.startup()
+    await asyncio.sleep(0.2)
+    await storage.shutdown()
+    assert b2_api.authorize_account.call_count>1
+
+
+@pytest.mark.anyio
+async def test_b2_storage_without_credentials_fails_uploads(b2_api):
+    storage=b2_storage.B2Storage(None,None,None)
+    await storage.startup()
+    b2_api.authorize_account.assert_not_called()
+    with pytest.raises(StorageUnavailable,match="B2_KEY_ID"):
+        storage.upload_stream(io.BytesIO(b"data"),"a.txt")
+    await storage.shutdown()
+
+
+@pytest.mark.anyio
+async def test_b2_storage_starts_while_b2_is_down(b2_api):
+    b2_api.authorize_account.side_effect=ConnectionError("b2 is down")
+    storage=b2_storage.B2Storage("key","secret","bucket")
+    await storage.startup()
+    try:
+        with pytest.raises(StorageUnavailable):
+            storage.upload_stream(io.BytesIO(b"data"),"a.txt")
+        # Back up: the next upload authorizes
+        b2_api.authorize_account.side_effect=None
+        assert storage.upload_stream(io.BytesIO(b"data"),"a.txt")=="https://fakeurl.com"
+    finally:
+        await storage.shutdown()
+
+
+@pytest.mark.anyio
+async def test_dev_config_stores_uploads_locally(monkeypatch):
+    monkeypatch.delenv("DEV_STORAGE_BACKEND",raising=False)
+    assert DevConfig(SECRET_KEY="x",ALGORITHM="HS256").STORAGE_BACKEND=="local"
@@ -0,0 +1,159 @@
+from typing import Callable
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.dialects import sqlite
+
+from storeapi import timeline
+from storeapi.config import config
+from storeapi.database import database, follow_table, timeline_table, user_table
+
+
+async def timeline_bodies(async_client:AsyncClient,user:dict,**params)->list[str]:
+    response=await async_client.get("/timeline",params=params,headers=user["headers"])
+    assert response.status_code==200
+    return [post["body"] for post in response.json()]
+
+async def follower_count(user:dict)->int:
+    return await database.fetch_val(
+        user_table.select().with_only_columns(user_table.c.follower_count)
+        .where(user_table.c.id==user["id"])
+    )
+
+@pytest.fixture()
+async def alice(create_user:Callable)->dict:
+    return await create_user("alice")
+
+@pytest.fixture()
+async def bob(create_user:Callable)->dict:
+    return await create_user("bob")
+
+
+@pytest.mark.anyio
+async def test_follow_and_unfollow(async_client:AsyncClient,alice:dict,bob:dict):
+    url=f"/user/{bob['id']}/follow"
+    response=await async_client.post(url,headers=alice["headers"])
+    assert response.status_code==201
+    assert response.json()=={"follower_id":alice["id"],"followee_id":bob["id"]}
+    response=await async_client.post(url,headers=alice["headers"])
+    assert response.status_code==200
+    assert await follower_count(bob)==1
+
+    response=await async_client.delete(url,headers=alice["headers"])
+    assert response.status_code==204
+    response=await async_client.delete(url,headers=alice["headers"])
+    assert response.status_code==404
+    assert await follower_count(bob)==0
+
+
+@pytest.mark.anyio
+async def test_follow_missing_user_or_self(async_client:AsyncClient,alice:dict):
+    response=await async_client.post("/user/123/follow",headers=alice["headers"])
+    assert response.status_code==404
+    response=await async_client.post(f"/user/{alice['id']}/follow",headers=alice["headers"])
+    assert response.status_code==400
+
+
+@pytest.mark.anyio
+async def test_timeline_fans_out_new_posts(
+    async_client:AsyncClient,alice:dict,bob:dict,create_post:Callable,create_user:Callable
+):
+    carol=await create_user("carol")
+    await async_client.post(f"/user/{bob['id']}/follow",headers=alice["headers"])
+    await create_post("bob 1",bob["token"])
+    await create_post("carol 1",carol["token"])
+    await create_post("alice 1",alice["token"])
+    await create_post("bob 2",bob["token"])
+
+    assert await timeline_bodies(async_client,alice)==["bob 2","alice 1","bob 1"]
+    rows=await database.fetch_all(
+        timeline_table.select().where(timeline_table.c.user_id==alice["id"])
+    )
+    assert len(rows)==3
+
+
+@pytest.mark.anyio
+async def test_follow_backfills_and_unfollow_removes(
+    async_client:AsyncClient,alice:dict,bob:dict,create_post:Callable
+):
+    await create_post("bob 1",bob["token"])
+    await async_client.post(f"/user/{bob['id']}/follow",headers=alice["headers"])
+    assert await timeline_bodies(async_client,alice)==["bob 1"]
+    await async_client.delete(f"/user/{bob['id']}/follow",headers=alice["headers"])
+    assert await timeline_bodies(async_client,alice)==[]
+
+
+@pytest.mark.anyio
+async def test_timeline_reads_authors_with_many_followers(
+    async_client:AsyncClient,alice:dict,bob:dict,monkeypatch,create_post:Callable
+):
+    monkeypatch.setattr(config,"TIMELINE_FANOUT_MAX_FOLLOWERS",0)
+    await async_client.post(f"/user/{bob['id']}/follow",headers=alice["headers"])
+    await create_post("bob 1",bob["token"])
+    assert await database.fetch_all(
+        timeline_table.select().where(timeline_table.c.user_id==alice["id"])
+    )==[]
+    assert await timeline_bodies(async_client,alice)==["bob 1"]
+
+
+@pytest.mark.anyio
+async def test_unfanned_posts_stay_after_author_drops_below_limit(
+    async_client:AsyncClient,alice:dict,bob:dict,
+    monkeypatch,create_post:Callable,create_user:Callable
+):
+    await async_client.post(f"/user/{bob['id']}/follow",headers=alice["headers"])
+    await create_post("bob 1",bob["token"])
+    monkeypatch.setattr(config,"TIMELINE_FANOUT_MAX_FOLLOWERS",0)
+    await create_post("bob 2",bob["token"])
+    monkeypatch.setattr(config,"TIMELINE_FANOUT_MAX_FOLLOWERS",10)
+    await create_post("bob 3",bob["token"])
+    assert await timeline_bodies(async_client,alice)==["bob 3","bob 2","bob 1"]
+    # A new follower gets the fanned out posts backfilled and reads the rest
+    carol=await create_user("carol")
+    await async_client.post(f"/user/{bob['id']}/follow",headers=carol["headers"])
+    assert await timeline_bodies(async_client,carol)==["bob 3","bob 2","bob 1"]
+
+
+@pytest.mark.anyio
+async def test_timeline_reads_only_a_page_per_part(alice:dict,bob:dict):
+    await database.execute(
+        user_table.update().where(user_table.c.id==bob["id"]).values(has_unfanned_posts=True)
+    )
+    await database.execute(
+        follow_table.insert().values(follower_id=alice["id"],followee_id=bob["id"])
+    )
+    query=await timeline.home_timeline_post_ids(database,alice["id"],20,100)
+    compiled=query.compile(dialect=sqlite.dialect(),compile_kwargs={"literal_binds":True})
+    plan=[row["detail"] for row in await database.fetch_all(f"EXPLAIN QUERY PLAN {compiled}")]
+    assert "SEARCH posts USING INDEX ix_posts_user_id_id (user_id=? AND id<?)" in plan
+    assert not [detail for detail in plan if detail.startswith(("SCAN posts","SCAN timeline"))]
+    assert not [detail for detail in plan if "MULTI-INDEX OR" in detail]
+
+
+@pytest.mark.anyio
+async def test_timeline_pagination(
+    async_client:AsyncClient,alice:dict,bob:dict,create_post:Callable
+):
+    await async_client.post(f"/user/{bob['id']}/follow",headers=alice["headers"])
+    for i in range(5):
+        await create_post(f"bob {i}",bob["token"])
+    response=await async_client.get("/timeline",params={"limit":3},headers=alice["headers"])
+    assert [post["body"] for post in response.json()]==["bob 4","bob 3","bob 2"]
+    after=response.headers["X-Next-Cursor"]
+    assert await timeline_bodies(async_client,alice,limit=3,after=after)==["bob 1","bob 0"]
+
+
+@pytest.mark.anyio
+async def test_deleted_posts_leave_timelines(
+    async_client:AsyncClient,alice:dict,bob:dict,create_post:Callable
+):
+    await async_client.post(f"/user/{bob['id']}/follow",headers=alice["headers"])
+    post_id=(await create_post("bob 1",bob["token"]))["id"]
+    await async_client.delete(f"/post/{post_id}",headers=bob["headers"])
+    assert await database.fetch_all(timeline_table.select())==[]
+
+
+@pytest.mark.anyio
+async def test_timeline_requires_login(async_client:AsyncClient):
+    response=await async_client.get("/timeline")
+    assert response.status_code==401
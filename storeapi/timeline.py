@@ -0,0 +1,189 @@
+import logging
+from typing import Optional
+
+import databases
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from storeapi import metrics
+from storeapi.config import config
+from storeapi.database import (
+    database,
+    follow_table,
+    post_table,
+    supports_returning,
+    timeline_table,
+    user_table,
+)
+
+logger = logging.getLogger(__name__)
+
+# Home timelines are written on post (fan-out on write): a new post is
+# copied to its author's and every follower's rows in timeline, so reading a
+# timeline is a range scan of one user's rows. Authors with more than
+# TIMELINE_FANOUT_MAX_FOLLOWERS followers would make that copy too large;
+# their posts are marked as not fanned out and fetched from posts when a
+# follower reads (fan-out on read). The mark stays with the post, so it is
+# still found if the author later drops below the limit.
+fanout_rows = metrics.counter("timeline.fanout_rows")
+fanout_skipped = metrics.counter("timeline.fanout_skipped")
+
+
+def fans_out(follower_count: int) -> bool:
+    return follower_count <= config.TIMELINE_FANOUT_MAX_FOLLOWERS
+
+
+async def fan_out(author_id: int, post_ids: list[int]) -> None:
+    # Copies new posts into the author's own and followers' timelines. Call
+    # it in the transaction that created the posts.
+    if not post_ids:
+        return
+    own_posts = sqlalchemy.select(post_table.c.user_id, post_table.c.id).where(
+        post_table.c.id.in_(post_ids)
+    )
+    await database.execute(timeline_table.insert().from_select(["user_id", "post_id"], own_posts))
+    follower_count = await database.fetch_val(
+        sqlalchemy.select(user_table.c.follower_count).where(user_table.c.id == author_id)
+    )
+    if not follower_count:
+        return
+    if not fans_out(follower_count):
+        fanout_skipped.inc(len(post_ids))
+        await database.execute(
+            post_table.update().where(post_table.c.id.in_(post_ids)).values(fanned_out=False)
+        )
+        await database.execute(
+            user_table.update()
+            .where(user_table.c.id == author_id, sqlalchemy.not_(user_table.c.has_unfanned_posts))
+            .values(has_unfanned_posts=True)
+        )
+        return
+    followers_posts = (
+        sqlalchemy.select(follow_table.c.follower_id, post_table.c.id)
+        .select_from(
+            follow_table.join(post_table, post_table.c.user_id == follow_table.c.followee_id)
+        )
+        .where(follow_table.c.followee_id == author_id, post_table.c.id.in_(post_ids))
+    )
+    await database.execute(
+        timeline_table.insert().from_select(["user_id", "post_id"], followers_posts)
+    )
+    fanout_rows.inc(follower_count * len(post_ids))
+
+
+def insert_follow_ignoring_duplicate(follower_id: int, followee_id: int):
+    dialect = postgresql if database.url.dialect == "postgresql" else sqlite
+    return (
+        dialect.insert(follow_table)
+        .values(follower_id=follower_id, followee_id=followee_id)
+        .on_conflict_do_nothing(index_elements=["follower_id", "followee_id"])
+    )
+
+
+async def insert_follow(follower_id: int, followee_id: int) -> bool:
+    # False when already following
+    insert = insert_follow_ignoring_duplicate(follower_id, followee_id)
+    if supports_returning():
+        return await database.fetch_val(insert.returning(follow_table.c.follower_id)) is not None
+    where = (follow_table.c.follower_id == follower_id, follow_table.c.followee_id == followee_id)
+    if await database.fetch_val(sqlalchemy.select(follow_table.c.follower_id).where(*where)):
+        return False
+    await database.execute(insert)
+    return True
+
+
+async def follow(follower_id: int, followee_id: int) -> Optional[bool]:
+    # None when the followee doesn't exist, False when already following
+    async with database.transaction():
+        follower_count = await database.fetch_val(
+            sqlalchemy.select(user_table.c.follower_count).where(user_table.c.id == followee_id)
+        )
+        if follower_count is None:
+            return None
+        if not await insert_follow(follower_id, followee_id):
+            return False
+        await database.execute(
+            user_table.update()
+            .where(user_table.c.id == followee_id)
+            .values(follower_count=user_table.c.follower_count + 1)
+        )
+        # Start the timeline off with the followee's recent posts. Those that
+        # weren't fanned out are read from posts instead.
+        recent_posts = (
+            sqlalchemy.select(sqlalchemy.literal(follower_id), post_table.c.id)
+            .where(post_table.c.user_id == followee_id, post_table.c.fanned_out)
+            .order_by(post_table.c.id.desc())
+            .limit(config.TIMELINE_BACKFILL_POSTS)
+        )
+        await database.execute(
+            timeline_table.insert().from_select(["user_id", "post_id"], recent_posts)
+        )
+    return True
+
+
+async def unfollow(follower_id: int, followee_id: int) -> bool:
+    # False when not following
+    where = (follow_table.c.follower_id == follower_id, follow_table.c.followee_id == followee_id)
+    async with database.transaction():
+        if supports_returning():
+            deleted = await database.fetch_val(
+                follow_table.delete().where(*where).returning(follow_table.c.follower_id)
+            )
+        else:
+            deleted = await database.fetch_val(
+                sqlalchemy.select(follow_table.c.follower_id).where(*where)
+            )
+            if deleted is not None:
+                await database.execute(follow_table.delete().where(*where))
+        if deleted is None:
+            return False
+        await database.execute(
+            user_table.update()
+            .where(user_table.c.id == followee_id)
+            .values(follower_count=user_table.c.follower_count - 1)
+        )
+        await database.execute(
+            timeline_table.delete().where(
+                timeline_table.c.user_id == follower_id,
+                timeline_table.c.post_id.in_(
+                    sqlalchemy.select(post_table.c.id).where(post_table.c.user_id == followee_id)
+                ),
+            )
+        )
+    return True
+
+
+async def home_timeline_post_ids(
+    db: databases.Database, user_id: int, limit: int, before: Optional[int]
+):
+    # Query for the ids of up to limit + 1 of the newest posts in user_id's
+    # home timeline before the post id `before`: their rows in timeline, and
+    # the posts that weren't fanned out by each followed account that has
+    # any. Every part reads at most one page from an index, and no post is
+    # in more than one part.
+    unfanned_authors = await db.fetch_all(
+        sqlalchemy.select(follow_table.c.followee_id)
+        .select_from(follow_table.join(user_table, user_table.c.id == follow_table.c.followee_id))
+        .where(follow_table.c.follower_id == user_id, user_table.c.has_unfanned_posts)
+    )
+    fanned_out = sqlalchemy.select(timeline_table.c.post_id.label("id")).where(
+        timeline_table.c.user_id == user_id
+    )
+    if before is not None:
+        fanned_out = fanned_out.where(timeline_table.c.post_id < before)
+    parts = [fanned_out.order_by(timeline_table.c.post_id.desc()).limit(limit + 1)]
+    for author in unfanned_authors:
+        # One range of ix_posts_user_id_id per author
+        read_directly = sqlalchemy.select(post_table.c.id).where(
+            post_table.c.user_id == author["followee_id"],
+            sqlalchemy.not_(post_table.c.fanned_out),
+        )
+        if before is not None:
+            read_directly = read_directly.where(post_table.c.id < before)
+        parts.append(read_directly.order_by(post_table.c.id.desc()).limit(limit + 1))
+    post_ids = sqlalchemy.union_all(
+        *(sqlalchemy.select(part.subquery().c.id) for part in parts)
+    ).subquery()
+    return (
+        sqlalchemy.select(post_ids.c.id).order_by(post_ids.c.id.desc()).limit(limit + 1)
+    )